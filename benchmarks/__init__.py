@@ -0,0 +1 @@
+"""Benchmarks offline do pipeline (ver benchmarks/bench.py)."""
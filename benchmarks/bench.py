@@ -0,0 +1,141 @@
+"""Benchmark offline das etapas do pipeline, com comparação contra um baseline salvo.
+
+Uso (na raiz do repositório):
+    python -m benchmarks.bench --salvar benchmarks/baseline.json
+    python -m benchmarks.bench --comparar benchmarks/baseline.json --tolerancia 0.25
+
+Roda sem rede: a consulta de CNPJ é substituída por um stub e os caches (CNPJ e
+resultados) ficam em um diretório temporário. Sai com código 1 se alguma medida
+ficar mais lenta que baseline * (1 + tolerância).
+"""
+import os
+import sys
+import json
+import time
+import atexit
+import shutil
+import argparse
+import platform
+import tempfile
+
+# Isola os caches antes de importar o pacote (os caminhos são lidos no import)
+_TMP = tempfile.mkdtemp(prefix="conprev-bench-")
+atexit.register(shutil.rmtree, _TMP, True)
+os.environ["CONPREV_CACHE_DIR"] = _TMP
+os.environ["CONPREV_OFFLINE"] = "1"
+os.environ["CONPREV_RESULT_CACHE"] = "0"
+
+import fitz  # PyMuPDF
+
+from conprev_restricoes import cnpj as _cnpj
+from conprev_restricoes.extracao import _extract_itens_from_stream, _extract_cnd_info_exact_stream
+from conprev_restricoes.municipios import MUNICIPIOS_POR_UF, encontrar_municipio
+from conprev_restricoes.relatorios import (
+    gerar_pdf_individual, gerar_pdf_gerencial_maed,
+    gerar_pdf_gerencial_devedor, gerar_pdf_validade_cnd,
+)
+
+from .sinteticos import gerar_relatorio_restricoes, gerar_cnd
+
+def _fetch_proibido(d):
+    raise RuntimeError("benchmark não deve acessar a rede")
+
+_cnpj._cnpj_fetch_brasilapi = _fetch_proibido
+
+def _cronometrar(funcao, repeticoes):
+    """Menor tempo (s) entre 'repeticoes' execuções de funcao()."""
+    melhor = None
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        funcao()
+        dt = time.perf_counter() - t0
+        melhor = dt if melhor is None else min(melhor, dt)
+    return melhor
+
+def _montar_lote(tamanho, paginas):
+    municipios = [m for lista in MUNICIPIOS_POR_UF.values() for m in lista]
+    arquivos = []
+    for k in range(tamanho):
+        mun = municipios[k % len(municipios)]
+        arquivos.append((f"Relatorio_{mun.replace(' ', '_')}_{k}.pdf", mun,
+                         gerar_relatorio_restricoes(paginas=paginas, seed=k)))
+    cnds = [gerar_cnd(validade=f"{(k % 28) + 1:02d}/{(k % 12) + 1:02d}/2026") for k in range(tamanho)]
+    return arquivos, cnds
+
+def executar(tamanhos, paginas, repeticoes):
+    todos_municipios = [m for lista in MUNICIPIOS_POR_UF.values() for m in lista]
+    medidas = {}
+    for tamanho in tamanhos:
+        arquivos, cnds = _montar_lote(tamanho, paginas)
+
+        medidas[f"extrair_itens/{tamanho}"] = _cronometrar(
+            lambda: [_extract_itens_from_stream(b, nome) for nome, _, b in arquivos], repeticoes)
+        medidas[f"extrair_cnd/{tamanho}"] = _cronometrar(
+            lambda: [_extract_cnd_info_exact_stream(b) for b in [a[2] for a in arquivos] + cnds], repeticoes)
+        nomes = [nome for nome, _, _ in arquivos] * 20
+        medidas[f"match_municipios/{tamanho}"] = _cronometrar(
+            lambda: [encontrar_municipio(n, todos_municipios) for n in nomes], repeticoes)
+
+        dados = {}
+        for nome, mun, b in arquivos:
+            dados.setdefault(mun, []).extend(_extract_itens_from_stream(b, nome))
+        todos_itens = [it for itens in dados.values() for it in itens]
+        lista_cnd = [{"arquivo": f"cnd_{k}.pdf", "nome": f"MUNICIPIO {k}", "cnpj": "01.234.567/0001-89",
+                      "validade": "31/12/2026", "dias": (k * 37) % 400 - 30} for k in range(tamanho * 4)]
+
+        medidas[f"gerar_pdf_individual/{tamanho}"] = _cronometrar(
+            lambda: gerar_pdf_individual(todos_itens, "Municipio Sintetico", "sintetico.pdf", None), repeticoes)
+        medidas[f"gerar_pdf_gerencial_maed/{tamanho}"] = _cronometrar(
+            lambda: gerar_pdf_gerencial_maed(dados, None), repeticoes)
+        medidas[f"gerar_pdf_gerencial_devedor/{tamanho}"] = _cronometrar(
+            lambda: gerar_pdf_gerencial_devedor(dados, None), repeticoes)
+        medidas[f"gerar_pdf_validade_cnd/{tamanho}"] = _cronometrar(
+            lambda: gerar_pdf_validade_cnd(list(lista_cnd), None), repeticoes)
+    return medidas
+
+def comparar(atual, baseline, tolerancia):
+    """Lista de (medida, baseline, atual, razão) e se houve regressão acima da tolerância."""
+    linhas, regressao = [], False
+    for nome, valor in atual.items():
+        base = baseline.get(nome)
+        razao = valor / base if base else None
+        if razao is not None and razao > 1 + tolerancia: regressao = True
+        linhas.append((nome, base, valor, razao))
+    return linhas, regressao
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tamanhos", default="1,10,50", help="Tamanhos de lote (nº de PDFs), separados por vírgula.")
+    parser.add_argument("--paginas", type=int, default=5, help="Páginas (blocos de registros) por relatório sintético.")
+    parser.add_argument("--repeticoes", type=int, default=3, help="Execuções por medida (vale a menor).")
+    parser.add_argument("--salvar", default=None, help="Grava as medidas como baseline neste JSON.")
+    parser.add_argument("--comparar", default=None, help="Compara com o baseline deste JSON.")
+    parser.add_argument("--tolerancia", type=float, default=0.25, help="Regressão aceita (0.25 = 25%% mais lento).")
+    args = parser.parse_args(argv)
+
+    tamanhos = [int(t) for t in args.tamanhos.split(",") if t.strip()]
+    medidas = executar(tamanhos, args.paginas, args.repeticoes)
+
+    baseline = {}
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            baseline = json.load(f)["medidas"]
+    linhas, regressao = comparar(medidas, baseline, args.tolerancia)
+    for nome, base, valor, razao in linhas:
+        extra = f"  baseline {base:8.4f}s  x{razao:5.2f}" if razao is not None else ""
+        alerta = "  <-- REGRESSÃO" if razao is not None and razao > 1 + args.tolerancia else ""
+        print(f"{nome:36s} {valor:8.4f}s{extra}{alerta}")
+
+    if args.salvar:
+        with open(args.salvar, "w", encoding="utf-8") as f:
+            json.dump({
+                "ambiente": {"python": platform.python_version(), "plataforma": platform.platform(),
+                             "pymupdf": fitz.VersionBind, "cpus": os.cpu_count()},
+                "parametros": {"tamanhos": tamanhos, "paginas": args.paginas, "repeticoes": args.repeticoes},
+                "medidas": medidas,
+            }, f, ensure_ascii=False, indent=2)
+        print(f"Baseline salvo em {args.salvar}")
+    return 1 if regressao else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
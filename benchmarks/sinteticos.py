@@ -0,0 +1,101 @@
+"""Gerador de PDFs sintéticos no layout do Relatório de Restrições e da CND (RFB/PGFN).
+
+Os documentos reproduzem a sequência de linhas que o parser espera: cabeçalhos
+"CNPJ: ..." (com e sem nome na mesma linha, e com órgão vinculado), registros
+DEVEDOR (8 linhas + "DEVEDOR"), MAED (linha do código + 5 linhas), OMISSÃO e
+seções de PROCESSO FISCAL pendente.
+"""
+import random
+
+import fitz  # PyMuPDF
+
+_ALTURA_LINHA = 11
+_MARGEM = 40
+
+def _cnpj_fake(rnd):
+    d = "".join(str(rnd.randrange(10)) for _ in range(8))
+    return f"{d[:2]}.{d[2:5]}.{d[5:8]}/0001-{rnd.randrange(100):02d}"
+
+def _valor(rnd):
+    v = f"{rnd.uniform(10, 250000):,.2f}"
+    return v.replace(",", "X").replace(".", ",").replace("X", ".")
+
+class _Escritor:
+    """Escreve uma linha de texto por vez, abrindo páginas novas quando necessário."""
+
+    def __init__(self, doc):
+        self.doc = doc
+        self.page = None
+        self.y = None
+
+    def nova_pagina(self):
+        self.page = self.doc.new_page()
+        self.y = _MARGEM
+
+    def linha(self, texto):
+        if self.page is None or self.y > self.page.rect.height - _MARGEM:
+            self.nova_pagina()
+        self.page.insert_text((_MARGEM, self.y), texto, fontsize=8)
+        self.y += _ALTURA_LINHA
+
+def gerar_relatorio_restricoes(paginas=5, cnpjs=2, devedores=4, maeds=3, omissoes=1, processos=1, seed=0):
+    """Bytes de um Relatório de Restrições com 'paginas' blocos de registros.
+
+    Cada bloco começa em página nova com o cabeçalho de um dos 'cnpjs' órgãos e traz
+    a quantidade informada de registros de cada tipo.
+    """
+    rnd = random.Random(seed)
+    orgaos = [(_cnpj_fake(rnd), f"MUNICIPIO SINTETICO {k}") for k in range(max(1, cnpjs))]
+    doc = fitz.open()
+    w = _Escritor(doc)
+    for p in range(paginas):
+        w.nova_pagina()
+        cnpj, nome = orgaos[p % len(orgaos)]
+        if p % 2 == 0:
+            w.linha(f"CNPJ: {cnpj} - {nome}")
+        else:
+            w.linha(f"CNPJ: {cnpj}")
+            w.linha("PREFEITURA MUNICIPAL SINTETICA")
+        if p % 3 == 2:
+            w.linha(f"CNPJ: {cnpj} ente vinculado ao RPPS")
+            w.linha("FUNDO MUNICIPAL DE PREVIDENCIA SINTETICO")
+        w.linha(f"Página {p + 1}")
+        for _ in range(devedores):
+            mes = rnd.randrange(1, 13)
+            w.linha(f"{rnd.choice(['1082-01', '1138-01', '1646-01', '2985-01'])} - CP SEGURADOS / PATRONAL")
+            w.linha(f"{mes:02d}/2023")
+            w.linha(f"20/{mes:02d}/2023")
+            for _ in range(5): w.linha(_valor(rnd))
+            w.linha("DEVEDOR")
+        for _ in range(maeds):
+            mes = rnd.randrange(1, 13)
+            w.linha(f"5440 - MAED DCTFWEB {rnd.randrange(1000)}")
+            w.linha(f"01/{mes:02d}/2023")
+            w.linha(f"20/{mes:02d}/2023")
+            w.linha(_valor(rnd)); w.linha(_valor(rnd))
+            w.linha("EM ABERTO")
+        for _ in range(omissoes):
+            w.linha("OMISSÃO DE DECLARAÇÃO - GFIP")
+            w.linha("PERÍODO")
+            w.linha(f"{rnd.randrange(1, 13):02d}/2022")
+        for _ in range(processos):
+            w.linha("PROCESSO FISCAL COM PENDÊNCIA")
+            w.linha(f"10120.{rnd.randrange(1000):03d}.{rnd.randrange(1000):03d}/2023-{rnd.randrange(100):02d}")
+            w.linha("SITUAÇÃO: DEVEDOR")
+            w.linha("PENDENCIA - FIM")
+    dados = doc.tobytes()
+    doc.close()
+    return dados
+
+def gerar_cnd(cnpj="01.234.567/0001-89", nome="MUNICIPIO SINTETICO", validade="31/12/2026"):
+    """Bytes de uma Certidão (CND/CPEND) com CNPJ, nome e data de validade."""
+    doc = fitz.open()
+    w = _Escritor(doc)
+    w.nova_pagina()
+    w.linha("MINISTÉRIO DA FAZENDA")
+    w.linha("CERTIDÃO POSITIVA COM EFEITOS DE NEGATIVA DE DÉBITOS RELATIVOS AOS TRIBUTOS FEDERAIS")
+    w.linha(f"CNPJ: {cnpj} - {nome}")
+    w.linha(f"Data de Validade: {validade}")
+    dados = doc.tobytes()
+    doc.close()
+    return dados
@@ -0,0 +1 @@
+"""Núcleo do Relatório de Restrições ConPrev (extração, CNPJ e relatórios), sem dependência do Streamlit."""
@@ -0,0 +1,88 @@
+"""Totais e contagens dos itens do lote por município, UF, tipo, CNPJ ou órgão.
+
+Soma centavos inteiros direto das colunas do ArmazemItens (nada de reparsear texto).
+Com NumPy instalado e lotes grandes, agrupa com np.unique + np.add.at sobre os
+arrays de códigos; sem NumPy, faz a mesma conta em Python puro.
+"""
+from array import array
+
+try:
+    import numpy as np
+except ImportError:  # NumPy é opcional
+    np = None
+
+from .armazem import CAMPOS_VALOR, _SEM_VALOR
+from .municipios import MUNICIPIOS_POR_UF
+
+_MIN_LINHAS_NUMPY = 5000  # abaixo disso o custo de conversão para NumPy não compensa
+_UF_DO_MUNICIPIO = {m: uf for uf, lista in MUNICIPIOS_POR_UF.items() for m in lista}
+
+def uf_do_municipio(municipio):
+    return _UF_DO_MUNICIPIO.get(municipio)
+
+def _coluna_chave(armazem, campo):
+    """(códigos por linha, valores por código) da dimensão de agrupamento."""
+    if campo == "municipio":
+        return armazem._mun.dados, armazem._mun.valores
+    if campo == "uf":
+        valores, codigo_uf = [None], {None: 0}
+        mapa = []
+        for mun in armazem._mun.valores:
+            uf = uf_do_municipio(mun)
+            if uf not in codigo_uf:
+                codigo_uf[uf] = len(valores)
+                valores.append(uf)
+            mapa.append(codigo_uf[uf])
+        return array("I", (mapa[c] for c in armazem._mun.dados)), valores
+    col = armazem._texto[campo]
+    return col.dados, col.valores
+
+def _somar_python(linhas, chaves, colunas):
+    acc = {}
+    for i in linhas:
+        chave = tuple(d[i] for d in chaves)
+        t = acc.get(chave)
+        if t is None: t = acc[chave] = [0] * (len(colunas) + 1)
+        t[0] += 1
+        for k, col in enumerate(colunas, 1):
+            v = col[i]
+            if v != _SEM_VALOR: t[k] += v
+    return sorted(acc.items())
+
+def _somar_numpy(linhas, chaves, colunas):
+    idx = np.asarray(linhas, dtype=np.int64)
+    if not len(idx): return []
+    if chaves:
+        matriz = np.stack([np.frombuffer(d, dtype=np.uint32)[idx] for d in chaves], axis=1)
+        unicas, inv = np.unique(matriz, axis=0, return_inverse=True)
+        inv = inv.reshape(-1)
+    else:
+        unicas, inv = np.zeros((1, 0), dtype=np.uint32), np.zeros(len(idx), dtype=np.int64)
+    somas = np.zeros((len(unicas), len(colunas) + 1), dtype=np.int64)
+    somas[:, 0] = np.bincount(inv, minlength=len(unicas))
+    for k, col in enumerate(colunas, 1):
+        v = np.frombuffer(col, dtype=np.int64)[idx]
+        np.add.at(somas[:, k], inv, np.where(v == _SEM_VALOR, 0, v))
+    return [(tuple(int(c) for c in u), [int(x) for x in s]) for u, s in zip(unicas, somas)]
+
+def totais(armazem, por=("municipio",), campos=CAMPOS_VALOR, tipo=None, linhas=None, usar_numpy=None):
+    """{(valores de 'por'): {"n": contagem, campo: soma em centavos}} na ordem dos códigos.
+
+    'por' aceita "municipio", "uf" ou campos de texto ("tipo", "cnpj", "orgao", ...);
+    por=() dá o total geral sob a chave (). 'linhas' restringe a um subconjunto de linhas.
+    usar_numpy=None escolhe NumPy automaticamente (se instalado e o lote for grande).
+    """
+    if linhas is None:
+        linhas = armazem.indices(tipo=tipo) if tipo is not None else range(len(armazem))
+    elif tipo is not None:
+        linhas = [i for i in linhas if armazem._get(i, "tipo") == tipo]
+    dims = [_coluna_chave(armazem, c) for c in por]
+    chaves = [d for d, _ in dims]
+    colunas = [armazem._valores[c] for c in campos]
+    if usar_numpy is None: usar_numpy = np is not None and len(linhas) >= _MIN_LINHAS_NUMPY
+    somar = _somar_numpy if usar_numpy and np is not None else _somar_python
+    resultado = {}
+    for codigos, somas in somar(linhas, chaves, colunas):
+        chave = tuple(valores[c] for (_, valores), c in zip(dims, codigos))
+        resultado[chave] = {"n": somas[0], **dict(zip(campos, somas[1:]))}
+    return resultado
@@ -0,0 +1,303 @@
+"""Armazenamento colunar compacto dos itens extraídos (DEVEDOR, MAED, OMISSÃO, ...).
+
+Em vez de um dict por item, cada campo de texto é uma coluna categórica (valores
+únicos + array de códigos) e cada valor monetário é um array de centavos, calculado
+uma única vez na inserção. Agrupamentos por município, tipo ou CNPJ viram
+varreduras sobre arrays de inteiros.
+
+O mesmo registro vindo de arquivos diferentes do município (prefeitura, câmara,
+reemissão) é guardado uma vez só: um índice por identidade normalizada (ver
+_identidade) junta as duplicatas na inserção e guarda a lista de arquivos de origem.
+O índice guarda só o hash de 64 bits da identidade e as linhas; a identidade das
+linhas candidatas é refeita a partir das colunas para descartar colisões.
+"""
+import re
+from array import array
+
+from .cnpj import _cnpj_digits, _resolver_cnpjs
+from .utils import valor_centavos
+
+# Campos de texto conhecidos dos itens, na ordem em que o parser os produz
+CAMPOS_TEXTO = (
+    "tipo", "cod", "nome", "desc", "comp", "venc", "orig", "dev", "multa", "juros", "cons",
+    "situacao", "raw", "periodo", "processo", "orgao", "cnpj", "src", "categoria",
+)
+CAMPOS_VALOR = ("orig", "dev", "multa", "juros", "cons")
+_SEM_VALOR = -(2 ** 63)  # sentinela de "sem valor" nos arrays de centavos
+_CAMPOS_CENTAVOS = {f"{c}_centavos": c for c in CAMPOS_VALOR}
+_RE_MAED_DISFARCADO = re.compile(r"MAED|DCTFWEB")
+
+def _chave_item(item):
+    """(código, competência) que identificam o item dentro do tipo."""
+    tipo = item.get("tipo")
+    if tipo == "OMISSÃO": return item.get("raw") or "", item.get("periodo") or ""
+    if tipo == "PROCESSO FISCAL": return item.get("processo") or "", ""
+    return item.get("cod") or "", item.get("comp") or ""
+
+def _identidade(item):
+    """Identidade normalizada do registro: tipo, CNPJ, código, competência, vencimento e valores."""
+    cod, comp = _chave_item(item)
+    valores = tuple(item[f"{c}_centavos"] if f"{c}_centavos" in item else valor_centavos(item.get(c))
+                    for c in CAMPOS_VALOR)
+    return (item.get("tipo") or "", _cnpj_digits(item.get("cnpj")), str(cod).strip().upper(), str(comp).strip(),
+            str(item.get("venc") or "").strip(), str(item.get("raw") or "").strip(), valores)
+
+def categoria_item(item):
+    """Categoria real do item: o tipo, exceto DEVEDOR que é um MAED disfarçado (vira "MAED").
+
+    MAED disfarçado: código 5440 ou MAED/DCTFWEB no código, na descrição ou na linha bruta.
+    """
+    tipo = item.get("tipo")
+    if tipo != "DEVEDOR": return tipo
+    cod = str(item.get("cod") or "")
+    if cod.startswith("5440"): return "MAED"
+    texto = " ".join(str(item.get(c) or "") for c in ("cod", "nome", "desc", "raw")).upper()
+    return "MAED" if _RE_MAED_DISFARCADO.search(texto) else tipo
+
+class _Categorica:
+    """Coluna categórica: cada valor distinto é guardado uma vez; as linhas guardam códigos."""
+    __slots__ = ("valores", "_codigos", "dados")
+
+    def __init__(self):
+        self.valores = [None]
+        self._codigos = {None: 0}
+        self.dados = array("I")
+
+    def codigo(self, v):
+        c = self._codigos.get(v)
+        if c is None:
+            c = self._codigos[v] = len(self.valores)
+            self.valores.append(v)
+        return c
+
+    def append(self, v):
+        self.dados.append(self.codigo(v))
+
+    def __getitem__(self, i):
+        return self.valores[self.dados[i]]
+
+    def __getstate__(self):
+        return self.valores, self.dados
+
+    def __setstate__(self, estado):
+        self.valores, self.dados = estado
+        self._codigos = {v: c for c, v in enumerate(self.valores)}
+
+class Registro:
+    """Visão de uma linha do armazém com a interface de leitura de um dict (get, [], in)."""
+    __slots__ = ("_armazem", "_i")
+
+    def __init__(self, armazem, i):
+        self._armazem = armazem
+        self._i = i
+
+    @property
+    def municipio(self):
+        return self._armazem._mun[self._i]
+
+    @property
+    def indice(self):
+        return self._i
+
+    @property
+    def fontes(self):
+        """Arquivos de origem do registro (mais de um quando duplicatas foram unificadas)."""
+        return self._armazem.fontes(self._i)
+
+    def get(self, campo, padrao=None):
+        v = self._armazem._get(self._i, campo)
+        return padrao if v is None else v
+
+    def __getitem__(self, campo):
+        v = self._armazem._get(self._i, campo)
+        if v is None: raise KeyError(campo)
+        return v
+
+    def __contains__(self, campo):
+        return self._armazem._get(self._i, campo) is not None
+
+    def centavos(self, campo):
+        """Valor monetário do campo em centavos (None se ausente ou não numérico)."""
+        return self._armazem.centavos(self._i, campo)
+
+    def to_dict(self):
+        return self._armazem._to_dict(self._i)
+
+    def __repr__(self):
+        return f"Registro({self.to_dict()!r})"
+
+class ArmazemItens:
+    """Itens de restrição de um lote, em colunas, com o município de cada item."""
+
+    def __init__(self, municipios=()):
+        # Os municípios informados fixam a ordem dos agrupamentos (ordem de seleção)
+        self._mun = _Categorica()
+        for m in municipios: self._mun.codigo(m)
+        self._texto = {c: _Categorica() for c in CAMPOS_TEXTO}
+        self._valores = {c: array("q") for c in CAMPOS_VALOR}
+        self._extras = {}  # linha -> campos fora do esquema (raros)
+        self._fontes = {}  # linha -> [src, ...] das linhas que unificaram duplicatas
+        self._dedup = {}   # hash de (município, identidade) -> linha ou [linhas]; None = reconstruir sob demanda
+        self.duplicatas = 0
+        self._n = 0
+
+    def __getstate__(self):
+        # O índice de duplicatas não vai para outros processos (é refeito se preciso)
+        return {**self.__dict__, "_dedup": None}
+
+    def __len__(self):
+        return self._n
+
+    def __iter__(self):
+        return (Registro(self, i) for i in range(self._n))
+
+    def _indice_dedup(self):
+        if self._dedup is None:
+            self._dedup = {}
+            for r in self: self._indexar(hash((r.municipio, _identidade(r))), r.indice)
+        return self._dedup
+
+    def _indexar(self, chave, i):
+        # Uma linha por chave é o caso comum: int em vez de lista
+        indice = self._indice_dedup()
+        linhas = indice.get(chave)
+        if linhas is None: indice[chave] = i
+        elif isinstance(linhas, int): indice[chave] = [linhas, i]
+        else: linhas.append(i)
+
+    def _iguais(self, chave, municipio, identidade):
+        """Linhas com a mesma identidade no município (conferida nas colunas: o hash pode colidir)."""
+        linhas = self._indice_dedup().get(chave, ())
+        if isinstance(linhas, int): linhas = (linhas,)
+        return [i for i in linhas if self._mun[i] == municipio and _identidade(Registro(self, i)) == identidade]
+
+    def fontes(self, i):
+        if i in self._fontes: return list(self._fontes[i])
+        src = self._texto["src"][i]
+        return [] if src is None else [src]
+
+    def adicionar(self, item, municipio=None):
+        """Acrescenta o item; se um registro idêntico de outro arquivo já existe, só junta a origem."""
+        # O parser já classifica os itens; itens antigos são classificados aqui
+        if "categoria" not in item: item = {**item, "categoria": categoria_item(item)}
+        identidade = _identidade(item)
+        chave = hash((municipio, identidade))
+        src = item.get("src")
+        if src is not None:
+            # Repetições dentro do mesmo arquivo são registros distintos; só outro arquivo duplica
+            for i in self._iguais(chave, municipio, identidade):
+                fontes = self.fontes(i)
+                if src not in fontes:
+                    self._fontes[i] = fontes + [src]
+                    self.duplicatas += 1
+                    return
+        self._indexar(chave, self._n)
+        self._mun.append(municipio)
+        for c, col in self._texto.items():
+            col.append(item.get(c))
+        for c, col in self._valores.items():
+            # O parser já entrega <campo>_centavos; itens antigos são convertidos aqui
+            chave = f"{c}_centavos"
+            cent = item[chave] if chave in item else valor_centavos(item.get(c))
+            col.append(_SEM_VALOR if cent is None else cent)
+        extras = {k: v for k, v in item.items() if k not in self._texto and k not in _CAMPOS_CENTAVOS}
+        if extras: self._extras[self._n] = extras
+        self._n += 1
+
+    def estender(self, itens, municipio=None):
+        for item in itens: self.adicionar(item, municipio)
+
+    def _get(self, i, campo):
+        col = self._texto.get(campo)
+        if col is not None: return col[i]
+        if campo in _CAMPOS_CENTAVOS: return self.centavos(i, _CAMPOS_CENTAVOS[campo])
+        return self._extras.get(i, {}).get(campo)
+
+    def _to_dict(self, i):
+        d = {c: col[i] for c, col in self._texto.items() if col[i] is not None}
+        for c in CAMPOS_VALOR:
+            if self._texto[c][i] is not None: d[f"{c}_centavos"] = self.centavos(i, c)
+        d.update(self._extras.get(i, {}))
+        if i in self._fontes: d["fontes"] = list(self._fontes[i])
+        return d
+
+    def centavos(self, i, campo):
+        v = self._valores[campo][i]
+        return None if v == _SEM_VALOR else v
+
+    def registro(self, i):
+        return Registro(self, i)
+
+    def municipios(self):
+        """Municípios conhecidos, na ordem de registro (inclusive os sem itens)."""
+        return self._mun.valores[1:]
+
+    def indices(self, municipio=None, tipo=None, categoria=None):
+        """Linhas que atendem aos filtros, na ordem de inserção."""
+        filtros = []
+        if municipio is not None:
+            filtros.append((self._mun.dados, self._mun._codigos.get(municipio, -1)))
+        for campo, valor in (("tipo", tipo), ("categoria", categoria)):
+            if valor is None: continue
+            col = self._texto[campo]
+            filtros.append((col.dados, col._codigos.get(valor, -1)))
+        linhas = range(self._n)
+        for dados, c in filtros:
+            linhas = [i for i in linhas if dados[i] == c]
+        return list(linhas)
+
+    def agrupar(self, campo, tipo=None, categoria=None):
+        """{valor do campo: [linhas]} (campo = "municipio" ou um campo de texto), na ordem dos valores."""
+        col = self._mun if campo == "municipio" else self._texto[campo]
+        filtrado = tipo is not None or categoria is not None
+        linhas = self.indices(tipo=tipo, categoria=categoria) if filtrado else range(self._n)
+        grupos = {}
+        for i in linhas:
+            grupos.setdefault(col.dados[i], []).append(i)
+        return {col.valores[c]: grupos[c] for c in sorted(grupos)}
+
+    def por_municipio(self, tipo=None, categoria=None):
+        """Lista (município, [Registro]) dos municípios com itens, na ordem dos municípios."""
+        return [(mun, [Registro(self, i) for i in linhas])
+                for mun, linhas in self.agrupar("municipio", tipo=tipo, categoria=categoria).items() if mun is not None]
+
+    def filtrar(self, municipio=None, tipo=None):
+        """Novo armazém só com as linhas filtradas (compacto para enviar a outro processo).
+
+        Filtrado por município, o novo armazém só conhece esse município: o recorte
+        não muda com os outros municípios selecionados.
+        """
+        sub = ArmazemItens(self.municipios() if municipio is None else [municipio])
+        for i in self.indices(municipio, tipo):
+            sub._mun.append(self._mun[i])
+            for c, col in self._texto.items(): sub._texto[c].append(col[i])
+            for c, col in self._valores.items(): sub._valores[c].append(col[i])
+            if i in self._extras: sub._extras[sub._n] = dict(self._extras[i])
+            if i in self._fontes: sub._fontes[sub._n] = list(self._fontes[i])
+            sub._n += 1
+        sub._dedup = None
+        return sub
+
+    def resolver_orgaos(self, header_map=None, offline=None):
+        """Mesma regra de _resolver_orgaos_itens, consultando cada CNPJ distinto uma única vez."""
+        header_map = header_map or {}
+        col_cnpj, col_org = self._texto["cnpj"], self._texto["orgao"]
+        nomes = _resolver_cnpjs([v for v in col_cnpj.valores if v], offline=offline)
+        novo_codigo = {}
+        for i in range(self._n):
+            chave = (col_cnpj.dados[i], col_org.dados[i])
+            if col_cnpj.valores[chave[0]] is None: continue
+            c = novo_codigo.get(chave)
+            if c is None:
+                d = _cnpj_digits(col_cnpj.valores[chave[0]])
+                nome = nomes.get(d) or col_org.valores[chave[1]] or header_map.get(d, "")
+                c = novo_codigo[chave] = col_org.codigo(nome)
+            col_org.dados[i] = c
+
+def como_armazem(dados):
+    """Aceita um ArmazemItens ou o formato antigo (dict município -> lista de dicts)."""
+    if isinstance(dados, ArmazemItens): return dados
+    armazem = ArmazemItens(list(dados))
+    for mun, itens in dados.items():
+        armazem.estender(itens, mun)
+    return armazem
@@ -0,0 +1,178 @@
+"""Cache de resultados de extração por hash do conteúdo do PDF.
+
+Dois níveis: memória (LRU limitado em bytes) e disco (arquivos .json.gz com
+despejo LRU pelo mtime, limitado em bytes). A chave é o SHA-256 dos bytes do
+arquivo + PARSER_VERSION, então reenviar o mesmo PDF (com qualquer nome) não
+refaz o parse, e mudar o parser invalida tudo automaticamente.
+
+CacheRelatorios guarda (só em memória) os PDFs já renderizados, pela assinatura
+das entradas de cada relatório: reprocessar o lote com outro filtro de municípios
+reaproveita os relatórios cujas entradas não mudaram.
+"""
+import os
+import gzip
+import json
+import pickle
+import hashlib
+import threading
+from datetime import date
+from collections import OrderedDict
+
+from .cnpj import _CNPJ_CACHE_DIR
+from .extracao import PARSER_VERSION
+
+_CACHE_ATIVO = os.environ.get("CONPREV_RESULT_CACHE", "1").strip() not in ("", "0")
+_MAX_MEMORIA = int(os.environ.get("CONPREV_RESULT_CACHE_MEM_MB", "64")) * 1024 * 1024
+_MAX_DISCO = int(os.environ.get("CONPREV_RESULT_CACHE_DISK_MB", "512")) * 1024 * 1024
+_MAX_RELATORIOS = int(os.environ.get("CONPREV_RENDER_CACHE_MB", "128")) * 1024 * 1024
+
+class CacheResultados:
+    """Cache (memória + disco) de (cnd, itens, header_map) por conteúdo do PDF."""
+
+    def __init__(self, diretorio=None, max_memoria=_MAX_MEMORIA, max_disco=_MAX_DISCO):
+        self.diretorio = diretorio or os.path.join(_CNPJ_CACHE_DIR, "resultados")
+        self.max_memoria = max_memoria
+        self.max_disco = max_disco
+        self._memoria = OrderedDict()  # chave -> blob gzip
+        self._bytes_memoria = 0
+        self._bytes_disco = None       # calculado na primeira gravação
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def chave(file_bytes) -> str:
+        return f"{hashlib.sha256(file_bytes).hexdigest()}-v{PARSER_VERSION}"
+
+    def _caminho(self, chave):
+        return os.path.join(self.diretorio, chave[:2], chave + ".json.gz")
+
+    def get(self, chave, filename):
+        """Resultado em cache com 'src' dos itens ajustado para filename, ou None."""
+        with self._lock:
+            blob = self._memoria.get(chave)
+            if blob is not None:
+                self._memoria.move_to_end(chave)
+        if blob is None:
+            caminho = self._caminho(chave)
+            try:
+                with open(caminho, "rb") as f: blob = f.read()
+                os.utime(caminho)  # marca uso recente para o LRU do disco
+            except OSError:
+                return None
+            self._guardar_memoria(chave, blob)
+        try:
+            dados = json.loads(gzip.decompress(blob).decode("utf-8"))
+        except Exception:
+            return None
+        itens = dados["itens"]
+        for it in itens: it["src"] = filename
+        return tuple(dados["cnd"]), itens, dados["header_map"], None
+
+    def put(self, chave, resultado):
+        cnd, itens, header_map, erro = resultado
+        if erro: return  # falhas de leitura não são cacheadas
+        dados = {"cnd": list(cnd), "itens": itens, "header_map": header_map}
+        blob = gzip.compress(json.dumps(dados, ensure_ascii=False).encode("utf-8"), compresslevel=5)
+        self._guardar_memoria(chave, blob)
+        self._guardar_disco(chave, blob)
+
+    def _guardar_memoria(self, chave, blob):
+        with self._lock:
+            antigo = self._memoria.pop(chave, None)
+            if antigo is not None: self._bytes_memoria -= len(antigo)
+            self._memoria[chave] = blob
+            self._bytes_memoria += len(blob)
+            while self._bytes_memoria > self.max_memoria and len(self._memoria) > 1:
+                _, velho = self._memoria.popitem(last=False)
+                self._bytes_memoria -= len(velho)
+
+    def _arquivos_disco(self):
+        for raiz, _, nomes in os.walk(self.diretorio):
+            for nome in nomes:
+                if nome.endswith(".json.gz"):
+                    caminho = os.path.join(raiz, nome)
+                    try: st = os.stat(caminho)
+                    except OSError: continue
+                    yield st.st_mtime, st.st_size, caminho
+
+    def _guardar_disco(self, chave, blob):
+        caminho = self._caminho(chave)
+        try:
+            os.makedirs(os.path.dirname(caminho), exist_ok=True)
+            tmp = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f: f.write(blob)
+            os.replace(tmp, caminho)
+        except OSError:
+            return
+        with self._lock:
+            if self._bytes_disco is None:
+                self._bytes_disco = sum(tam for _, tam, _ in self._arquivos_disco())
+            else:
+                self._bytes_disco += len(blob)
+            if self._bytes_disco > self.max_disco:
+                self._despejar_disco()
+
+    def _despejar_disco(self):
+        arquivos = sorted(self._arquivos_disco())
+        total = sum(tam for _, tam, _ in arquivos)
+        for _, tam, caminho in arquivos:
+            if total <= self.max_disco * 0.9: break
+            try:
+                os.remove(caminho)
+                total -= tam
+            except OSError: pass
+        self._bytes_disco = total
+
+class CacheRelatorios:
+    """PDFs renderizados (LRU em memória, limitado em bytes) por assinatura das entradas.
+
+    A assinatura é o hash da função e de todos os argumentos do relatório (itens do
+    município, fonte, logo, lista de CNDs...) e da data: um relatório só é refeito
+    quando alguma das entradas dele muda.
+    """
+
+    def __init__(self, max_bytes=_MAX_RELATORIOS):
+        self.max_bytes = max_bytes
+        self._pdfs = OrderedDict()  # chave -> bytes do PDF
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def chave(funcao, args):
+        h = hashlib.sha256(f"{funcao.__module__}.{funcao.__qualname__}:{date.today().isoformat()}".encode("utf-8"))
+        h.update(pickle.dumps(args, protocol=pickle.HIGHEST_PROTOCOL))
+        return h.hexdigest()
+
+    def get(self, chave):
+        with self._lock:
+            pdf_bytes = self._pdfs.get(chave)
+            if pdf_bytes is not None: self._pdfs.move_to_end(chave)
+            return pdf_bytes
+
+    def put(self, chave, pdf_bytes):
+        with self._lock:
+            antigo = self._pdfs.pop(chave, None)
+            if antigo is not None: self._bytes -= len(antigo)
+            self._pdfs[chave] = pdf_bytes
+            self._bytes += len(pdf_bytes)
+            while self._bytes > self.max_bytes and len(self._pdfs) > 1:
+                _, velho = self._pdfs.popitem(last=False)
+                self._bytes -= len(velho)
+
+_CACHE_PADRAO = None
+_CACHE_RELATORIOS = None
+
+def cache_padrao():
+    """Cache compartilhado do processo (None se desativado por CONPREV_RESULT_CACHE=0)."""
+    global _CACHE_PADRAO
+    if not _CACHE_ATIVO: return None
+    if _CACHE_PADRAO is None:
+        _CACHE_PADRAO = CacheResultados()
+    return _CACHE_PADRAO
+
+def cache_relatorios_padrao():
+    """Cache de relatórios do processo (None se desativado por CONPREV_RESULT_CACHE=0)."""
+    global _CACHE_RELATORIOS
+    if not _CACHE_ATIVO: return None
+    if _CACHE_RELATORIOS is None:
+        _CACHE_RELATORIOS = CacheRelatorios()
+    return _CACHE_RELATORIOS
@@ -0,0 +1,163 @@
+"""Linha de comando para execuções agendadas (cron) sem o Streamlit.
+
+Exemplos:
+    conprev-restricoes run --input pdfs/ --uf GO,TO --out saida.zip --workers 8
+    conprev-restricoes vigiar --pasta entrada/ --out saida.zip
+"""
+import os
+import sys
+import argparse
+from datetime import datetime
+
+from .cnpj import _CNPJ_OFFLINE
+from .municipios import MUNICIPIOS_POR_UF, municipios_das_ufs
+from .paralelo import workers_padrao
+from .pipeline import processar_lote
+from .historico import HistoricoItens
+from .exportacao import FORMATOS, formatos_disponiveis
+from .vigia import VigiaPasta
+
+def _listar_pdfs(entradas):
+    """Expande arquivos e diretórios (não recursivo) em uma lista ordenada de PDFs e ZIPs."""
+    caminhos = []
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            for nome in sorted(os.listdir(entrada)):
+                caminho = os.path.join(entrada, nome)
+                if os.path.isfile(caminho) and nome.lower().endswith((".pdf", ".zip")):
+                    caminhos.append(caminho)
+        elif os.path.isfile(entrada):
+            caminhos.append(entrada)
+        else:
+            raise SystemExit(f"Entrada não encontrada: {entrada}")
+    return caminhos
+
+def _ler_arquivo(caminho):
+    with open(caminho, "rb") as f:
+        return f.read()
+
+def _split_csv(valor):
+    return [v.strip() for v in (valor or "").split(",") if v.strip()]
+
+def _formatos_dados(valor):
+    """Formatos pedidos em --dados (None = todos os disponíveis, "nenhum" = nenhum)."""
+    if valor is None: return None
+    formatos = [f.lower() for f in _split_csv(valor)]
+    if formatos == ["nenhum"]: return ()
+    invalidos = [f for f in formatos if f not in FORMATOS]
+    if invalidos:
+        raise SystemExit(f"Formato(s) de dados desconhecido(s): {', '.join(invalidos)}")
+    indisponiveis = [f for f in formatos if f not in formatos_disponiveis()]
+    if indisponiveis:
+        raise SystemExit(f"Formato(s) indisponível(is) nesta instalação: {', '.join(indisponiveis)} (Parquet requer o pyarrow)")
+    return tuple(formatos)
+
+def _selecao(args):
+    """(ufs, municípios) selecionados por --uf e --municipios."""
+    ufs = [uf.upper() for uf in _split_csv(args.uf)] or list(MUNICIPIOS_POR_UF)
+    invalidas = [uf for uf in ufs if uf not in MUNICIPIOS_POR_UF]
+    if invalidas:
+        raise SystemExit(f"UF(s) não cadastrada(s): {', '.join(invalidas)}")
+
+    municipios = municipios_das_ufs(ufs)
+    filtro = _split_csv(args.municipios)
+    if filtro:
+        municipios = [m for m in municipios if m in filtro]
+    if not municipios:
+        raise SystemExit("Nenhum município selecionado para processamento.")
+    return ufs, municipios
+
+def _cmd_run(args):
+    ufs, municipios = _selecao(args)
+
+    caminhos = _listar_pdfs(args.input)
+    if not caminhos:
+        raise SystemExit("Nenhum arquivo PDF ou ZIP encontrado na entrada.")
+
+    # Caminhos: cada PDF (solto ou dentro de um .zip) só é lido quando o lote chega nele
+    arquivos = caminhos
+    logo_bytes = _ler_arquivo(args.logo) if args.logo else None
+
+    def progresso(fracao, mensagem):
+        if args.verbose:
+            print(f"[{fracao:4.0%}] {mensagem}", file=sys.stderr)
+
+    resumo = processar_lote(
+        arquivos, municipios, args.out, logo_bytes=logo_bytes,
+        workers=args.workers, offline=args.offline or _CNPJ_OFFLINE, progresso=progresso,
+        usar_cache=not args.sem_cache, usar_roteamento=not args.sem_roteamento,
+        formatos_dados=_formatos_dados(args.dados),
+        historico=None if args.sem_historico else HistoricoItens(args.historico),
+    )
+    for erro in resumo["erros"]:
+        print(erro, file=sys.stderr)
+    print(f"{resumo['arquivos_usados']}/{resumo['total_arquivos']} arquivos identificados "
+          f"em {len(ufs)} UF(s) -> {args.out}")
+    if resumo["duplicatas"]:
+        print(f"{resumo['duplicatas']} item(ns) repetido(s) entre arquivos unificado(s)")
+    if args.perfil:
+        resumo["perfil"].salvar_json(args.perfil)
+        print(f"Perfil de tempos -> {args.perfil}")
+    return 0
+
+def _cmd_vigiar(args):
+    _, municipios = _selecao(args)
+    if not os.path.isdir(args.pasta):
+        raise SystemExit(f"Pasta não encontrada: {args.pasta}")
+    if os.path.dirname(os.path.realpath(args.out)) == os.path.realpath(args.pasta):
+        raise SystemExit(f"O ZIP de saída ({args.out}) não pode ficar na pasta vigiada ({args.pasta}).")
+    vigia = VigiaPasta(
+        args.pasta, args.out, municipios, logo_bytes=_ler_arquivo(args.logo) if args.logo else None,
+        workers=args.workers, offline=args.offline or _CNPJ_OFFLINE, intervalo=args.intervalo, espera=args.espera,
+        usar_roteamento=not args.sem_roteamento, formatos_dados=_formatos_dados(args.dados),
+    )
+
+    def ao_atualizar(afetados):
+        for erro in vigia.erros():
+            print(erro, file=sys.stderr)
+        print(f"[{datetime.now():%H:%M:%S}] {args.out} atualizado"
+              + (f" ({', '.join(sorted(afetados))})" if afetados else ""), flush=True)
+
+    print(f"Vigiando {args.pasta} a cada {args.intervalo:g}s (Ctrl+C para sair)", flush=True)
+    try:
+        vigia.executar(ao_atualizar)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+def _args_comuns(p):
+    p.add_argument("--out", "-o", required=True, help="Caminho do ZIP de saída.")
+    p.add_argument("--uf", default="", help="UFs separadas por vírgula (padrão: todas).")
+    p.add_argument("--municipios", default="", help="Filtra municípios específicos (separados por vírgula).")
+    p.add_argument("--workers", "-w", type=int, default=workers_padrao(), help="Processos paralelos (1 = sequencial).")
+    p.add_argument("--logo", default=None, help="Imagem do logo para os relatórios.")
+    p.add_argument("--offline", action="store_true", help="Não consulta CNPJs na BrasilAPI.")
+    p.add_argument("--sem-roteamento", action="store_true", help="Identifica o município só pelo nome do arquivo, sem o índice de CNPJs.")
+    p.add_argument("--dados", default=None, help=f"Formatos da exportação de itens/CNDs em Dados/, separados por vírgula ({','.join(FORMATOS)}; padrão: todos os disponíveis; \"nenhum\" desativa).")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="conprev-restricoes", description="Relatório de Restrições ConPrev (modo headless).")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    run = sub.add_parser("run", help="Processa um lote de PDFs e gera o ZIP com os relatórios.")
+    run.add_argument("--input", "-i", nargs="+", required=True, help="Diretório(s) ou arquivo(s) PDF/ZIP de entrada.")
+    _args_comuns(run)
+    run.add_argument("--sem-cache", action="store_true", help="Ignora o cache de extração e refaz o parse de todos os PDFs.")
+    run.add_argument("--historico", default=None, help="Banco SQLite do histórico (padrão: no diretório de cache).")
+    run.add_argument("--sem-historico", action="store_true", help="Não grava o lote no histórico nem gera o relatório de Novidades.")
+    run.add_argument("--perfil", default=None, help="Grava em JSON os tempos por etapa e os arquivos mais lentos.")
+    run.add_argument("--verbose", "-v", action="store_true", help="Mostra o progresso em stderr.")
+    run.set_defaults(func=_cmd_run)
+
+    vigiar = sub.add_parser("vigiar", help="Vigia uma pasta e mantém o ZIP atualizado conforme os PDFs chegam.")
+    vigiar.add_argument("--pasta", "-p", required=True, help="Pasta vigiada (PDFs e ZIPs de PDFs, não recursivo).")
+    _args_comuns(vigiar)
+    vigiar.add_argument("--intervalo", type=float, default=5.0, help="Segundos entre varreduras da pasta.")
+    vigiar.add_argument("--espera", type=float, default=2.0, help="Segundos sem mudança para considerar um arquivo completo.")
+    vigiar.set_defaults(func=_cmd_vigiar)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
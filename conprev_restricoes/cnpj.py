@@ -0,0 +1,139 @@
+"""Resolução de nomes de órgãos por CNPJ (BrasilAPI + cache persistente)."""
+import re
+import os
+import json
+import time
+import sqlite3
+import threading
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+
+# Resolução de nomes por CNPJ: memória -> cache SQLite (sobrevive a reinícios) -> BrasilAPI.
+# CNPJ não encontrado também é gravado (cache negativo), com TTL menor que o dos acertos;
+# falhas temporárias (429, 5xx, timeout) só são lembradas em memória, por poucos minutos.
+_CNPJ_CACHE_DIR = os.environ.get("CONPREV_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "conprev")
+_CNPJ_CACHE_DB = os.path.join(_CNPJ_CACHE_DIR, "cnpj_nomes.sqlite3")
+_CNPJ_TTL_HIT = 30 * 24 * 3600
+_CNPJ_TTL_MISS = 24 * 3600
+_CNPJ_TTL_FALHA = 5 * 60
+_CNPJ_LOOKUP_WORKERS = 8
+_CNPJ_OFFLINE = os.environ.get("CONPREV_OFFLINE", "").strip() not in ("", "0")
+_CNPJ_LOOKUP_CACHE = {}  # dígitos -> nome ("" = não encontrado)
+_CNPJ_FALHAS = {}        # dígitos -> time.time() da última falha temporária da consulta
+_HTTP_LOCAL = threading.local()
+
+def _cnpj_digits(s) -> str:
+    return re.sub(r"\D", "", str(s or ""))[:14]
+
+def _cnpj_cache_conn():
+    os.makedirs(_CNPJ_CACHE_DIR, exist_ok=True)
+    conn = sqlite3.connect(_CNPJ_CACHE_DB, timeout=10)
+    conn.execute("CREATE TABLE IF NOT EXISTS cnpj_nomes (cnpj TEXT PRIMARY KEY, nome TEXT NOT NULL, ts REAL NOT NULL)")
+    return conn
+
+def _cnpj_cache_get(digitos) -> dict:
+    """Busca no cache em disco as entradas ainda dentro do TTL (acerto ou falha)."""
+    if not digitos: return {}
+    agora = time.time()
+    achados = {}
+    try:
+        conn = _cnpj_cache_conn()
+        try:
+            lista = list(digitos)
+            for k in range(0, len(lista), 500):
+                bloco = lista[k:k+500]
+                q = f"SELECT cnpj, nome, ts FROM cnpj_nomes WHERE cnpj IN ({','.join('?' * len(bloco))})"
+                for cnpj, nome, ts in conn.execute(q, bloco):
+                    ttl = _CNPJ_TTL_HIT if nome else _CNPJ_TTL_MISS
+                    if agora - ts < ttl: achados[cnpj] = nome
+        finally:
+            conn.close()
+    except: pass
+    return achados
+
+def _cnpj_cache_put(resultados: dict):
+    if not resultados: return
+    agora = time.time()
+    try:
+        conn = _cnpj_cache_conn()
+        try:
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO cnpj_nomes (cnpj, nome, ts) VALUES (?, ?, ?)",
+                                 [(d, nome or "", agora) for d, nome in resultados.items()])
+        finally:
+            conn.close()
+    except: pass
+
+def _cnpj_fetch_brasilapi(d: str):
+    """Consulta um CNPJ reaproveitando a conexão HTTPS (keep-alive) da thread.
+
+    Retorna o nome, "" se o CNPJ não existe (404/400 ou sem razão social) ou None em
+    falha temporária (limite de requisições, erro do servidor, timeout, rede).
+    """
+    for _ in range(2):
+        conn = getattr(_HTTP_LOCAL, "conn", None)
+        if conn is None:
+            conn = _HTTP_LOCAL.conn = http.client.HTTPSConnection("brasilapi.com.br", timeout=5)
+        try:
+            conn.request("GET", f"/api/cnpj/v1/{d}", headers={"User-Agent": "conprev-app"})
+            resp = conn.getresponse()
+            body = resp.read()
+            if resp.status in (400, 404): return ""
+            if resp.status != 200: return None
+            data = json.loads(body.decode("utf-8", "ignore"))
+            return (data.get("razao_social") or data.get("nome_fantasia") or "").strip()
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            # Conexão keep-alive encerrada pelo servidor: reabre e tenta de novo
+            conn.close(); _HTTP_LOCAL.conn = None
+        except:
+            conn.close(); _HTTP_LOCAL.conn = None
+            return None
+    return None
+
+def _resolver_cnpjs(cnpjs, offline=None) -> dict:
+    """Resolve de uma vez os CNPJs distintos de um lote. Retorna dígitos -> nome ("" se não achou)."""
+    offline = _CNPJ_OFFLINE if offline is None else offline
+    digitos = {d for d in (_cnpj_digits(c) for c in cnpjs) if len(d) == 14}
+    res = {d: _CNPJ_LOOKUP_CACHE[d] for d in digitos if d in _CNPJ_LOOKUP_CACHE}
+
+    pend = digitos - res.keys()
+    if pend:
+        do_disco = _cnpj_cache_get(pend)
+        _CNPJ_LOOKUP_CACHE.update(do_disco)
+        res.update(do_disco)
+
+    # Falha temporária recente: não consulta de novo (nem espera o timeout) neste intervalo
+    agora = time.time()
+    pend = sorted(d for d in digitos - res.keys() if agora - _CNPJ_FALHAS.get(d, 0) >= _CNPJ_TTL_FALHA)
+    if pend and not offline:
+        with ThreadPoolExecutor(max_workers=min(_CNPJ_LOOKUP_WORKERS, len(pend))) as ex:
+            consultados = dict(zip(pend, ex.map(_cnpj_fetch_brasilapi, pend)))
+        novos = {d: nome for d, nome in consultados.items() if nome is not None}
+        _CNPJ_FALHAS.update((d, agora) for d, nome in consultados.items() if nome is None)
+        for d in novos: _CNPJ_FALHAS.pop(d, None)
+        _CNPJ_LOOKUP_CACHE.update(novos)
+        _cnpj_cache_put(novos)
+        res.update(novos)
+    return res
+
+def _cnpj_lookup_online(cnpj_in: str) -> str:
+    d = _cnpj_digits(cnpj_in)
+    if len(d) != 14: return ""
+    return _resolver_cnpjs([d]).get(d, "")
+
+def _resolve_name_prefer_cnpj(label: str, cnpj_masked: str) -> str:
+    nm = _cnpj_lookup_online(cnpj_masked)
+    return nm or (label or "")
+
+def _resolver_orgaos_itens(itens, header_map=None, offline=None):
+    """Preenche 'orgao' dos itens com uma única rodada de consultas para o lote.
+
+    Prioridade: nome oficial do CNPJ > órgão lido no cabeçalho (current_org) > header_map.
+    """
+    header_map = header_map or {}
+    nomes = _resolver_cnpjs([it.get("cnpj") for it in itens if it.get("cnpj")], offline=offline)
+    for it in itens:
+        if "cnpj" not in it: continue
+        d = _cnpj_digits(it["cnpj"])
+        it["orgao"] = nomes.get(d) or it.get("orgao") or header_map.get(d, "")
+    return itens
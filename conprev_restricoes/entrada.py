@@ -0,0 +1,161 @@
+"""Entradas de um lote: PDFs soltos (em memória ou em disco) e PDFs dentro de arquivos ZIP.
+
+Cada entrada tem um 'nome' e é lida sob demanda (ler()), uma de cada vez, para o lote
+não precisar manter todos os PDFs em memória. Membros de ZIP nunca são extraídos para
+o disco, e o original vai para o ZIP de saída copiando os bytes já comprimidos do
+arquivo de origem (copiar_para), sem descomprimir nem recomprimir.
+"""
+import io
+import os
+import zlib
+import struct
+import zipfile
+
+_BLOCO_COPIA = 1024 * 1024
+_FLAG_CRIPTOGRAFADO = 0x01
+_FLAGS_COMPRESSAO = 0x06  # opções do método de compressão (ex.: marcador EOS do LZMA)
+_FLAG_UTF8 = 0x800
+# Atributos internos do ZipFile usados na cópia bruta (conferidos antes de gravar)
+_INTERNOS_ORIGEM = ("_lock", "fp")
+_INTERNOS_DESTINO = ("_lock", "fp", "_writing", "_seekable", "start_dir", "_writecheck", "filelist", "NameToInfo")
+# Falhas ao ler uma entrada (membro corrompido, criptografado ou truncado, arquivo removido):
+# afetam só aquele arquivo, nunca o lote
+_ERROS_LEITURA = (zipfile.BadZipFile, RuntimeError, OSError, EOFError, zlib.error)
+
+class PDFEmMemoria:
+    """PDF já carregado (ex.: upload do Streamlit)."""
+    __slots__ = ("nome", "_dados")
+
+    def __init__(self, nome, dados):
+        self.nome = nome
+        self._dados = dados
+
+    def ler(self):
+        return self._dados
+
+    def copiar_para(self, zip_destino, caminho):
+        # PDFs já são comprimidos: gravar sem deflate economiza CPU
+        zip_destino.writestr(caminho, self._dados, compress_type=zipfile.ZIP_STORED)
+
+class PDFEmDisco:
+    """PDF em disco, lido só quando o lote chega nele."""
+    __slots__ = ("nome", "caminho")
+
+    def __init__(self, caminho, nome=None):
+        self.caminho = caminho
+        self.nome = nome or os.path.basename(caminho)
+
+    def ler(self):
+        with open(self.caminho, "rb") as f:
+            return f.read()
+
+    def copiar_para(self, zip_destino, caminho):
+        zip_destino.write(self.caminho, caminho, compress_type=zipfile.ZIP_STORED)
+
+class MembroZip:
+    """PDF dentro de um ZIP de entrada, descomprimido só em ler()."""
+    __slots__ = ("nome", "_zip", "_info")
+
+    def __init__(self, zip_origem, info):
+        self._zip = zip_origem
+        self._info = info
+        self.nome = _nome_membro(info)
+
+    def ler(self):
+        return self._zip.read(self._info)
+
+    def copiar_para(self, zip_destino, caminho):
+        try:
+            _copiar_membro_bruto(self._zip, self._info, zip_destino, caminho)
+        except (ValueError, NotImplementedError, AttributeError, zipfile.BadZipFile):
+            # AttributeError: internos do zipfile diferentes nesta versão do Python.
+            # Membro ilegível levanta um de _ERROS_LEITURA antes de gravar qualquer byte
+            dados = self.ler()
+            zip_destino.writestr(caminho, dados, compress_type=zipfile.ZIP_STORED)
+
+def _nome_membro(info):
+    """Nome do PDF no lote: caminho do membro achatado ("pasta/x.pdf" -> "pasta_x.pdf").
+
+    Sem a flag UTF-8, o zipfile decodifica o nome como cp437; ZIPs do Windows em
+    português costumam vir em UTF-8 sem a flag ou em cp850.
+    """
+    nome = info.filename
+    if not info.flag_bits & _FLAG_UTF8:
+        try:
+            bruto = nome.encode("cp437")
+        except UnicodeEncodeError:
+            bruto = None
+        if bruto is not None:
+            try: nome = bruto.decode("utf-8")
+            except UnicodeDecodeError: nome = bruto.decode("cp850")
+    return nome.strip("/").replace("/", "_")
+
+def _copiar_membro_bruto(origem, info, destino, caminho):
+    """Copia o membro 'info' de 'origem' para 'destino' com os bytes comprimidos originais.
+
+    O zipfile não expõe cópia sem recompressão; a gravação segue a mesma sequência
+    de ZipFile.mkdir (cabeçalho local com CRC e tamanhos já conhecidos + dados).
+    Se os internos usados não existirem, levanta AttributeError antes de gravar qualquer byte.
+    """
+    if info.flag_bits & _FLAG_CRIPTOGRAFADO: raise ValueError("membro criptografado")
+    for zf, internos in ((origem, _INTERNOS_ORIGEM), (destino, _INTERNOS_DESTINO)):
+        faltando = [a for a in internos if not hasattr(zf, a)]
+        if faltando: raise AttributeError(f"zipfile sem {', '.join(faltando)}")
+    novo = zipfile.ZipInfo(caminho, date_time=info.date_time)
+    novo.compress_type = info.compress_type
+    novo.CRC, novo.compress_size, novo.file_size = info.CRC, info.compress_size, info.file_size
+    novo.flag_bits = info.flag_bits & _FLAGS_COMPRESSAO
+    novo.external_attr = info.external_attr or (0o600 << 16)
+    zip64 = max(novo.file_size, novo.compress_size) > zipfile.ZIP64_LIMIT
+
+    with origem._lock, destino._lock:
+        if destino._writing: raise ValueError("ZIP de destino com outra gravação aberta")
+        # Início dos dados: depois do cabeçalho local (30 bytes + nome + extra)
+        fp = origem.fp
+        fp.seek(info.header_offset)
+        cabecalho = fp.read(30)
+        if len(cabecalho) != 30 or cabecalho[:4] != zipfile.stringFileHeader:
+            raise zipfile.BadZipFile(f"cabeçalho inválido para {info.filename}")
+        n_nome, n_extra = struct.unpack("<HH", cabecalho[26:30])
+        fp.seek(info.header_offset + 30 + n_nome + n_extra)
+
+        if destino._seekable: destino.fp.seek(destino.start_dir)
+        novo.header_offset = destino.fp.tell()
+        destino._writecheck(novo)
+        destino._didModify = True
+        destino.fp.write(novo.FileHeader(zip64))
+        restante = info.compress_size
+        while restante:
+            bloco = fp.read(min(_BLOCO_COPIA, restante))
+            if not bloco: raise zipfile.BadZipFile(f"dados truncados em {info.filename}")
+            destino.fp.write(bloco)
+            restante -= len(bloco)
+        destino.start_dir = destino.fp.tell()
+        destino.filelist.append(novo)
+        destino.NameToInfo[novo.filename] = novo
+
+def _membros_pdf(zip_origem):
+    return [MembroZip(zip_origem, info) for info in zip_origem.infolist()
+            if not info.is_dir() and info.filename.lower().endswith(".pdf")]
+
+def entradas_de(nome, origem):
+    """Entradas de uma fonte: 'origem' são bytes, um caminho em disco ou um arquivo aberto.
+
+    Um .zip vira uma entrada por PDF contido (o ZIP é lido sob demanda, sem extrair);
+    qualquer outro arquivo vira uma única entrada.
+    """
+    if nome.lower().endswith(".zip"):
+        if isinstance(origem, (bytes, bytearray)): origem = io.BytesIO(origem)
+        return _membros_pdf(zipfile.ZipFile(origem))
+    if isinstance(origem, (bytes, bytearray)): return [PDFEmMemoria(nome, bytes(origem))]
+    if isinstance(origem, (str, os.PathLike)): return [PDFEmDisco(origem, nome)]
+    return [PDFEmMemoria(nome, origem.read())]
+
+def normalizar_entradas(arquivos):
+    """Lista de entradas a partir de (nome, bytes/arquivo), caminhos em disco ou entradas prontas."""
+    entradas = []
+    for arq in arquivos:
+        if hasattr(arq, "ler"): entradas.append(arq)
+        elif isinstance(arq, (str, os.PathLike)): entradas.extend(entradas_de(os.path.basename(arq), arq))
+        else: entradas.extend(entradas_de(*arq))
+    return entradas
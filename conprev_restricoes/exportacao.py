@@ -0,0 +1,143 @@
+"""Exportação dos itens e da validade das CNDs em formatos para máquina (JSONL, CSV, Parquet).
+
+Os arquivos vão para a pasta Dados/ do ZIP de saída, gravados em blocos direto no
+ZIP (sem montar o arquivo inteiro em memória). O esquema é fixo (ESQUEMA_ITENS e
+ESQUEMA_CNDS): datas em ISO (tipo date no Parquet) e valores em centavos inteiros.
+Parquet só é gerado com o pyarrow instalado.
+"""
+import csv
+import io
+import json
+import time
+import zipfile
+from datetime import date
+from itertools import islice
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow é opcional
+    pa = pq = None
+
+from .armazem import CAMPOS_VALOR
+from .agregacao import uf_do_municipio
+from .cnpj import _cnpj_digits
+from .utils import _parse_date_br_to_date
+
+VERSAO_ESQUEMA = 3
+_LINHAS_POR_BLOCO = 10000
+
+# (coluna, tipo): "texto", "data", "inteiro" (os *_centavos são valores em centavos) ou "lista"
+# (de textos; no CSV, separados por ";")
+ESQUEMA_ITENS = (
+    ("municipio", "texto"), ("uf", "texto"), ("arquivo", "texto"), ("arquivos", "lista"),
+    ("tipo", "texto"), ("categoria", "texto"),
+    ("cnpj", "texto"), ("orgao", "texto"), ("codigo", "texto"), ("descricao", "texto"),
+    ("competencia", "data"), ("vencimento", "data"), ("situacao", "texto"),
+    ("periodo", "texto"), ("processo", "texto"), ("texto", "texto"),
+    *((f"{c}_centavos", "inteiro") for c in CAMPOS_VALOR),
+)
+ESQUEMA_CNDS = (
+    ("arquivo", "texto"), ("nome", "texto"), ("cnpj", "texto"),
+    ("validade", "data"), ("dias", "inteiro"),
+)
+
+FORMATOS = ("jsonl", "csv", "parquet")
+
+def formatos_disponiveis():
+    return FORMATOS if pq is not None else FORMATOS[:2]
+
+def _data_competencia(s):
+    """'mm/aaaa' -> date do primeiro dia do mês (None se não for uma competência)."""
+    try:
+        mes, ano = str(s).strip().split("/")
+        return date(int(ano), int(mes), 1)
+    except (ValueError, TypeError):
+        return None
+
+def linhas_itens(armazem):
+    """Tuplas na ordem de ESQUEMA_ITENS, uma por item do armazém."""
+    for r in armazem:
+        mun = r.municipio
+        cnpj = _cnpj_digits(r.get("cnpj"))
+        yield (
+            mun, uf_do_municipio(mun) if mun else None, r.get("src"), r.fontes, r.get("tipo"), r.get("categoria"),
+            cnpj or None, r.get("orgao") or None, r.get("cod"), r.get("nome") or r.get("desc"),
+            _data_competencia(r.get("comp")) if "comp" in r else None,
+            _parse_date_br_to_date(r.get("venc")) if "venc" in r else None,
+            r.get("situacao"), r.get("periodo") or None, r.get("processo"), r.get("raw"),
+            *(r.centavos(c) for c in CAMPOS_VALOR),
+        )
+
+def linhas_cnds(lista_cnd):
+    """Tuplas na ordem de ESQUEMA_CNDS, uma por CND do lote."""
+    for c in lista_cnd:
+        cnpj = _cnpj_digits(c.get("cnpj"))
+        yield (c.get("arquivo"), c.get("nome") or None, cnpj or None,
+               _parse_date_br_to_date(c.get("validade")) if c.get("validade") else None, c.get("dias"))
+
+def _texto_json(v):
+    return v.isoformat() if isinstance(v, date) else v
+
+def _texto_csv(v):
+    if v is None: return ""
+    if isinstance(v, list): return ";".join(v)
+    return _texto_json(v)
+
+def _membro(zip_file, caminho, compress_type=None):
+    """ZipInfo do membro com a data/hora atual (zip_file.open(nome) gravaria 1980-01-01)."""
+    info = zipfile.ZipInfo(caminho, date_time=time.localtime()[:6])
+    info.compress_type = zip_file.compression if compress_type is None else compress_type
+    info.external_attr = 0o600 << 16
+    return info
+
+def _gravar_jsonl(zip_file, caminho, esquema, linhas):
+    colunas = [c for c, _ in esquema]
+    with zip_file.open(_membro(zip_file, caminho), "w") as bruto, io.TextIOWrapper(bruto, encoding="utf-8", newline="\n") as f:
+        for linha in linhas:
+            f.write(json.dumps(dict(zip(colunas, map(_texto_json, linha))), ensure_ascii=False))
+            f.write("\n")
+
+def _gravar_csv(zip_file, caminho, esquema, linhas):
+    with zip_file.open(_membro(zip_file, caminho), "w") as bruto, io.TextIOWrapper(bruto, encoding="utf-8", newline="") as f:
+        w = csv.writer(f)
+        w.writerow([c for c, _ in esquema])
+        for linha in linhas:
+            w.writerow([_texto_csv(v) for v in linha])
+
+def _esquema_arrow(esquema):
+    tipos = {"texto": pa.string(), "data": pa.date32(), "inteiro": pa.int64(), "lista": pa.list_(pa.string())}
+    return pa.schema([(c, tipos[t]) for c, t in esquema], metadata={"versao_esquema": str(VERSAO_ESQUEMA)})
+
+def _gravar_parquet(zip_file, caminho, esquema, linhas):
+    schema = _esquema_arrow(esquema)
+    # Parquet já comprime as colunas: o membro do ZIP vai sem deflate
+    with zip_file.open(_membro(zip_file, caminho, zipfile.ZIP_STORED), "w") as f:
+        writer = pq.ParquetWriter(f, schema)
+        try:
+            while True:
+                bloco = list(islice(linhas, _LINHAS_POR_BLOCO))
+                if not bloco: break
+                writer.write_batch(pa.record_batch([list(col) for col in zip(*bloco)], schema=schema))
+        finally:
+            writer.close()
+
+_GRAVADORES = {"jsonl": _gravar_jsonl, "csv": _gravar_csv, "parquet": _gravar_parquet}
+
+def exportar_dados(zip_file, armazem, lista_cnd, formatos=None, pasta="Dados"):
+    """Grava itens e CNDs do lote no ZIP em cada formato e retorna os caminhos gravados.
+
+    formatos=None usa todos os disponíveis (Parquet só com pyarrow); pedir Parquet sem
+    pyarrow gera ImportError.
+    """
+    formatos = formatos_disponiveis() if formatos is None else formatos
+    caminhos = []
+    for fmt in formatos:
+        if fmt == "parquet" and pq is None:
+            raise ImportError("Exportação em Parquet requer o pyarrow (pip install pyarrow).")
+        for nome, esquema, linhas in (("itens", ESQUEMA_ITENS, linhas_itens(armazem)),
+                                      ("cnds", ESQUEMA_CNDS, linhas_cnds(lista_cnd))):
+            caminho = f"{pasta}/{nome}.{fmt}"
+            _GRAVADORES[fmt](zip_file, caminho, esquema, linhas)
+            caminhos.append(caminho)
+    return caminhos
@@ -0,0 +1,445 @@
+"""Extração de dados dos PDFs da RFB/PGFN (Relatório de Restrições e CND)."""
+import os
+import re
+import logging
+
+import fitz  # PyMuPDF
+
+from .utils import _mask_cnpj_digits, valor_centavos
+from .armazem import CAMPOS_VALOR, categoria_item
+from .cnpj import _resolver_orgaos_itens
+from .perfil import cronometro
+
+logger = logging.getLogger(__name__)
+
+# Versão da saída do parser: incremente ao mudar os campos/valores extraídos (invalida o cache)
+PARSER_VERSION = 4
+
+# Relatórios com pelo menos 2 blocos destes podem ter as páginas extraídas em paralelo;
+# PDFs menores que _BYTES_MIN_DIVISAO nem são abertos para contar as páginas
+_PAGINAS_POR_BLOCO = max(1, int(os.environ.get("CONPREV_PAGINAS_POR_BLOCO", "25")))
+_BYTES_MIN_DIVISAO = int(os.environ.get("CONPREV_DIVISAO_MIN_KB", "512")) * 1024
+
+
+def _extrair_pagina(page):
+    """Texto corrido e linhas estruturadas de uma página, com uma única análise de layout (TextPage)."""
+    tp = page.get_textpage()
+    texto = page.get_text("text", textpage=tp)
+    linhas = []
+    for b in page.get_text("dict", textpage=tp)["blocks"]:
+        for l in b.get("lines", []):
+            text = "".join([s["text"] for s in l.get("spans", [])])
+            text = " ".join(text.split())
+            if text: linhas.append(text)
+    return {"texto": texto, "linhas": linhas}
+
+class _PaginasPDF:
+    """Páginas de um PDF extraídas sob demanda: cada página é lida no máximo uma vez.
+
+    Indexável (inclusive por fatia) e iterável como a lista de páginas, mas só extrai
+    o que for acessado. Se 'tempos' (dict) for informado, acumula nele os segundos de
+    abrir_pdf e extrair_texto.
+    """
+
+    def __init__(self, file_bytes, tempos=None):
+        with cronometro(tempos, "abrir_pdf"):
+            self._doc = fitz.open(stream=file_bytes, filetype="pdf")
+        self._tempos = tempos
+        self._lidas = {}
+
+    def __len__(self):
+        return self._doc.page_count
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice): return [self[i] for i in range(*idx.indices(len(self)))]
+        pagina = self._lidas.get(idx)
+        if pagina is None:
+            with cronometro(self._tempos, "extrair_texto"):
+                pagina = self._lidas[idx] = _extrair_pagina(self._doc[idx])
+        return pagina
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def carregar(self, n=None):
+        """Extrai já as n primeiras páginas (todas se n=None), para o tempo não cair no parser."""
+        self[:n]
+
+    def close(self):
+        self._doc.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def _header_map_from_paginas(paginas):
+    """Mapa CNPJ -> nome do órgão vinculado, lido do texto corrido do relatório."""
+    header_map = {}
+    try:
+        full_text = "".join(p["texto"] for p in paginas)
+        for m in re.finditer(r"CNPJ:\s*([\d\./\-]{14,20}).{0,160}?vinculado.*?\n([^\n]+)", full_text, flags=re.I):
+            cn = re.sub(r"\D", "", m.group(1))[:14]
+            header_map[cn] = " ".join(m.group(2).split())
+    except: pass
+    return header_map
+
+# --- Classificador de linhas do Relatório de Restrições ---
+# Cada linha recebe um tipo em uma única passada (regras em ordem de precedência) e é
+# despachada para o handler do tipo. Novos tipos de registro: uma regra + um handler.
+_RE_CNPJ_LINHA = re.compile(r"CNPJ[:\s]*([0-9\.\-\/]{14,18})(?:\s*-\s*(.+))?", re.I)
+_RE_DIGITO = re.compile(r"\d")
+_RE_NAO_DIGITO = re.compile(r"\D")
+_RE_ANO = re.compile(r"\d{4}")  # também cobre competências no formato mm/aaaa
+_RE_DATA_COMPLETA = re.compile(r"\d{2}/\d{2}/\d{4}$")
+_RE_PROCESSO = re.compile(r"(\d{4,6}\.\d{3}\.\d{3}/\d{4}-\d{2})")
+
+# (tipo, condição sobre a linha em maiúsculas): a primeira regra que casa define o tipo
+_REGRAS_LINHA = [
+    ("CNPJ", lambda U: "CNPJ" in U),
+    ("DEVEDOR", lambda U: U == "DEVEDOR"),
+    ("MAED", lambda U: "MAED" in U),
+    ("OMISSÃO", lambda U: "OMISS" in U),
+    ("PF_INICIO", lambda U: "PROCESSO FISCAL" in U and "PEND" in U),
+]
+
+def _classificar_linha(U):
+    for tipo, regra in _REGRAS_LINHA:
+        if regra(U): return tipo
+    return None
+
+class _PaginaClassificada:
+    """Linhas de uma página, com maiúsculas e tipo calculados uma única vez."""
+    __slots__ = ("linhas", "upper", "tipos", "_processos")
+
+    def __init__(self, linhas):
+        self.linhas = linhas
+        self.upper = [t.upper() for t in linhas]
+        self.tipos = [_classificar_linha(U) for U in self.upper]
+        self._processos = None
+
+    def processo(self, j):
+        """Número de processo fiscal da linha j (busca feita uma vez por página, sob demanda)."""
+        if self._processos is None:
+            self._processos = [m.group(1) if m else None for m in map(_RE_PROCESSO.search, self.linhas)]
+        return self._processos[j]
+
+def _novo_item(estado, tipo, **campos):
+    item = {
+        "tipo": tipo, **campos,
+        "orgao": estado["org"] or "",
+        "cnpj": _mask_cnpj_digits(estado["cnpj"]), "src": estado["src"],
+    }
+    # Valores monetários convertidos uma única vez para centavos exatos (int)
+    for c in CAMPOS_VALOR:
+        if c in campos: item[f"{c}_centavos"] = valor_centavos(campos[c])
+    return item
+
+def _h_cnpj(pg, i, estado):
+    # A. Cabeçalho CNPJ
+    lines = pg.linhas
+    m = _RE_CNPJ_LINHA.search(lines[i])
+    if not m: return
+    estado["cnpj"] = _RE_NAO_DIGITO.sub("", m.group(1))
+    # Itens criados antes do primeiro cabeçalho herdam o contexto (ver _costurar_blocos)
+    estado.setdefault("n_sem_cnpj", len(estado["itens"]))
+    name_inline = (m.group(2) or "").strip()
+    if name_inline and not _RE_DIGITO.search(name_inline):
+        estado["org"] = name_inline
+        estado.setdefault("n_sem_org", len(estado["itens"]))
+        return
+    # Busca nas próximas linhas
+    for k in range(1, 5):
+        if i+k >= len(lines): break
+        nxt = lines[i+k].strip()
+        if len(nxt) >= 5 and not _RE_DIGITO.search(nxt) and "PÁGINA" not in pg.upper[i+k]:
+            estado["org"] = nxt
+            estado.setdefault("n_sem_org", len(estado["itens"]))
+            break
+
+def _h_devedor(pg, i, estado):
+    # B. DEVEDOR: o registro são as 8 linhas anteriores
+    lines = pg.linhas
+    try:
+        if i >= 8:
+            cod_nome = lines[i-8]
+            comp = lines[i-7]; venc = lines[i-6]; orig = lines[i-5]
+            dev = lines[i-4]; multa = lines[i-3]; juros = lines[i-2]; cons = lines[i-1]
+
+            parts = cod_nome.split(" - ", 1)
+            cod = parts[0] if len(parts) > 0 else ""
+            nome = parts[1] if len(parts) > 1 else cod_nome.replace(cod, "").strip()
+
+            estado["itens"].append(_novo_item(
+                estado, "DEVEDOR", cod=cod, nome=nome, comp=comp, venc=venc, orig=orig,
+                dev=dev, multa=multa, juros=juros, cons=cons,
+            ))
+    except:
+        estado["itens"].append({"tipo": "DEVEDOR", "raw": lines[i], "src": estado["src"]})
+
+def _h_maed(pg, i, estado):
+    # C. MAED: o registro são as 5 linhas seguintes
+    lines = pg.linhas
+    t = lines[i]
+    try:
+        pa_comp = lines[i+1]; venc = lines[i+2]; orig = lines[i+3]; dev = lines[i+4]; situ = lines[i+5]
+        parts = t.split(" - ", 1)
+        cod = parts[0].strip()
+        desc = parts[1].strip() if len(parts) > 1 else "MAED"
+
+        comp = pa_comp
+        if _RE_DATA_COMPLETA.match(pa_comp):
+            comp = f"{pa_comp[3:5]}/{pa_comp[6:10]}"
+
+        estado["itens"].append(_novo_item(
+            estado, "MAED", cod=cod, desc=desc, comp=comp, venc=venc, orig=orig,
+            dev=dev, situacao=situ.strip(),
+        ))
+    except:
+        estado["itens"].append({"tipo": "MAED", "raw": t, "src": estado["src"]})
+
+def _h_omissao(pg, i, estado):
+    # D. OMISSÃO: período na primeira das 6 linhas seguintes que tenha um ano
+    periodo = None
+    for k in range(1, 7):
+        if i+k >= len(pg.linhas): break
+        look = pg.upper[i+k]
+        if "PERÍODO" in look: continue
+        if _RE_ANO.search(look):
+            periodo = pg.linhas[i+k]
+            break
+    estado["itens"].append(_novo_item(estado, "OMISSÃO", raw=pg.linhas[i], periodo=periodo or ""))
+
+def _h_pf_inicio(pg, i, estado):
+    # E. PROCESSO FISCAL (Lógica simplificada para Web)
+    estado["pf_inside"] = True
+
+def _h_outras(pg, i, estado):
+    # Linhas sem tipo: só interessam dentro de uma seção de PROCESSO FISCAL
+    if not estado["pf_inside"]: return
+    U = pg.upper[i]
+    if "PENDENCIA -" in U: estado["pf_inside"] = False
+
+    if "DEVEDOR" in U:
+        # Tenta achar o processo nas linhas vizinhas
+        proc = None
+        for k in range(-5, 5):
+            if 0 <= i+k < len(pg.linhas):
+                proc = pg.processo(i+k)
+                if proc: break
+
+        if proc:
+            estado["itens"].append(_novo_item(estado, "PROCESSO FISCAL", processo=proc, situacao="DEVEDOR"))
+
+_HANDLERS_LINHA = {
+    "CNPJ": _h_cnpj,
+    "DEVEDOR": _h_devedor,
+    "MAED": _h_maed,
+    "OMISSÃO": _h_omissao,
+    "PF_INICIO": _h_pf_inicio,
+    None: _h_outras,
+}
+
+def _parse_paginas(paginas, filename):
+    """Estado final do parser (itens, CNPJ/órgão correntes) depois das páginas dadas."""
+    # CNPJ/órgão correntes atravessam páginas; a seção de PROCESSO FISCAL não
+    estado = {"cnpj": None, "org": None, "pf_inside": False, "itens": [], "src": filename}
+
+    for pagina in paginas:
+        estado["pf_inside"] = False
+        pg = _PaginaClassificada(pagina["linhas"])
+        for i, tipo in enumerate(pg.tipos):
+            _HANDLERS_LINHA[tipo](pg, i, estado)
+
+    # Categoria real de cada registro (ex.: MAED disfarçado de DEVEDOR), decidida uma única vez
+    for item in estado["itens"]: item["categoria"] = categoria_item(item)
+    return estado
+
+def _extract_itens_from_paginas(paginas, filename):
+    """Extrai itens de restrição a partir das páginas (lista ou _PaginasPDF)."""
+    return _parse_paginas(paginas, filename)["itens"]
+
+# --- Classificação do documento pela primeira página ---
+_MAX_PAGINAS_CND = 2  # a CND tem no máximo 2 páginas, as mesmas que a leitura da CND cobre
+_RE_VALIDADE = re.compile(r"(?im)Data\s*de\s*Validade\s*:\s*([0-9]{2}/[0-9]{2}/[0-9]{4})")
+_TIPOS_REGISTRO = {"DEVEDOR", "MAED", "OMISSÃO", "PF_INICIO"}
+
+def _classificar_documento(primeira, n_paginas):
+    """'RESTRICOES', 'CND' ou None (não reconhecido), olhando só a primeira página.
+
+    O relatório de restrições também fala em certidão ("Informações de Apoio para Emissão
+    de Certidão"): só é CND com data de validade e sem nenhuma marca de relatório. Na
+    dúvida, parse completo (numa CND ele dá o mesmo resultado: dados da certidão, sem itens).
+    """
+    tipos = set(_PaginaClassificada(primeira["linhas"]).tipos)
+    if tipos & _TIPOS_REGISTRO: return "RESTRICOES"
+    U = primeira["texto"].upper()
+    relatorio = "CNPJ" in tipos or "RESTRI" in U or "SITUAÇÃO FISCAL" in U
+    validade = _RE_VALIDADE.search(primeira["texto"])
+    if validade and not relatorio and n_paginas <= _MAX_PAGINAS_CND: return "CND"
+    if validade or relatorio or "CERTID" in U: return "RESTRICOES"
+    return None
+
+def _extract_cnd_info_from_paginas(paginas):
+    texto = "".join(p["texto"] for p in paginas[:2])
+    
+    cnpj = ""; validade = ""; nome = ""
+    
+    m_nome = re.search(r"(?im)^\s*CNPJ\s*:\s*[0-9\.\-\/]{8,18}\s*[-–—]\s*([^\n]+)$", texto, re.MULTILINE)
+    if m_nome and "ENTE FEDERATIVO" not in m_nome.group(1).upper():
+        nome = m_nome.group(1).strip()
+    elif not nome:
+        m_mun = re.search(r"(?im)^\s*Munic[ií]pio\s*:\s*([^\n]+)$", texto, re.MULTILINE)
+        if m_mun: nome = m_mun.group(1).strip()
+
+    m_cnpj = re.search(r"(\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2})", texto)
+    if m_cnpj: cnpj = m_cnpj.group(1)
+
+    m_val = _RE_VALIDADE.search(texto)
+    if m_val: validade = m_val.group(1)
+
+    return cnpj, validade, nome
+
+def _extract_pdf_completo(file_bytes, filename, resolver_nomes=True, offline=None, tempos=None):
+    """Caminho único do lote: um parse por arquivo alimenta CND, header_map e itens.
+
+    Com resolver_nomes=False o 'orgao' fica com o nome do cabeçalho e a resolução
+    por CNPJ fica a cargo do chamador (uma vez por lote, via _resolver_orgaos_itens).
+    Retorna (cnd, itens, header_map, erro); 'erro' é None ou a mensagem para a interface.
+    'tempos' (dict opcional) recebe os segundos gastos em cada etapa.
+
+    A primeira página decide o caminho: CND lê só as páginas da certidão, relatório
+    de restrições segue para o parser de itens e o resto é recusado sem ler mais nada.
+    """
+    vazio = ("", "", ""), [], {}
+    try:
+        paginas = _PaginasPDF(file_bytes, tempos=tempos)
+    except Exception as e:
+        return (*vazio, f"Erro ao ler PDF {filename}: {e}")
+    with paginas:
+        try:
+            tipo = _classificar_documento(paginas[0], len(paginas)) if len(paginas) else "RESTRICOES"
+            if tipo is None:
+                return (*vazio, f"Arquivo {filename} ignorado: não parece uma CND nem um Relatório de Restrições.")
+            paginas.carregar(_MAX_PAGINAS_CND if tipo == "CND" else None)
+        except Exception as e:
+            return (*vazio, f"Erro ao ler PDF {filename}: {e}")
+        erro = None
+        with cronometro(tempos, "parse_cnd"):
+            cnd = _extract_cnd_info_from_paginas(paginas)
+        if tipo == "CND": return cnd, [], {}, None
+        with cronometro(tempos, "parse_itens"):
+            header_map = _header_map_from_paginas(paginas)
+            try:
+                itens = _extract_itens_from_paginas(paginas, filename)
+            except Exception as e:
+                erro = f"Erro ao ler PDF {filename}: {e}"
+                itens = []
+    if resolver_nomes:
+        with cronometro(tempos, "resolver_nomes"):
+            _resolver_orgaos_itens(itens, header_map, offline=offline)
+    return cnd, itens, header_map, erro
+
+# --- Relatórios longos: blocos de páginas extraídos em paralelo e costurados em ordem ---
+# Nenhum registro atravessa páginas (o parser olha só a página da linha), então o único
+# estado entre blocos é o CNPJ/órgão corrente, completado na costura.
+
+def _planejar_blocos(file_bytes, partes):
+    """Intervalos [inicio, fim) para extrair o PDF em até 'partes' blocos paralelos, ou [].
+
+    Só PDFs a partir de _BYTES_MIN_DIVISAO são abertos. A primeira página é classificada
+    aqui, antes de dividir (como em _extract_pdf_completo): CND, documento não reconhecido
+    ou relatório curto demais seguem pelo caminho normal, sem ler as outras páginas.
+    """
+    if partes < 2 or len(file_bytes) < _BYTES_MIN_DIVISAO: return []
+    try:
+        with _PaginasPDF(file_bytes) as paginas:
+            n_paginas = len(paginas)
+            if n_paginas < 2 * _PAGINAS_POR_BLOCO: return []
+            if _classificar_documento(paginas[0], n_paginas) != "RESTRICOES": return []
+    except Exception:
+        return []  # o caminho normal reporta o erro de leitura
+    blocos = _blocos_paginas(n_paginas, partes)
+    return blocos if len(blocos) > 1 else []
+
+def _blocos_paginas(n_paginas, partes):
+    """Até 'partes' intervalos [inicio, fim) contíguos, cada um com pelo menos _PAGINAS_POR_BLOCO páginas."""
+    partes = max(1, min(partes, n_paginas // _PAGINAS_POR_BLOCO))
+    tam, resto = divmod(n_paginas, partes)
+    blocos, inicio = [], 0
+    for k in range(partes):
+        fim = inicio + tam + (k < resto)
+        blocos.append((inicio, fim))
+        inicio = fim
+    return blocos
+
+def _extrair_bloco(file_bytes, filename, inicio, fim, tempos=None):
+    """Texto e itens das páginas [inicio, fim) de um relatório (uma parte do parse paralelo).
+
+    O bloco começa sem CNPJ/órgão correntes: os n_sem_cnpj/n_sem_org primeiros itens
+    ficam sem eles até _costurar_blocos trazer o contexto dos blocos anteriores.
+    """
+    bloco = {"inicio": inicio, "erro_leitura": None, "erro_parse": None}
+    try:
+        with _PaginasPDF(file_bytes, tempos=tempos) as paginas:
+            bloco["n_paginas"] = len(paginas)
+            pags = paginas[inicio:fim]
+    except Exception as e:
+        bloco["erro_leitura"] = f"Erro ao ler PDF {filename}: {e}"
+        return bloco
+    bloco["primeira"] = pags[0] if inicio == 0 and pags else None
+    bloco["textos"] = [p["texto"] for p in pags]
+    with cronometro(tempos, "parse_itens"):
+        try:
+            estado = _parse_paginas(pags, filename)
+        except Exception as e:
+            bloco["erro_parse"] = f"Erro ao ler PDF {filename}: {e}"
+            return bloco
+    n = len(estado["itens"])
+    bloco.update(itens=estado["itens"], cnpj=estado["cnpj"], org=estado["org"],
+                 n_sem_cnpj=estado.get("n_sem_cnpj", n), n_sem_org=estado.get("n_sem_org", n))
+    return bloco
+
+def _costurar_blocos(blocos, filename):
+    """(cnd, itens, header_map, erro) dos blocos de _extrair_bloco, igual ao parse sequencial.
+
+    Como em _extract_pdf_completo(resolver_nomes=False): o 'orgao' fica com o nome do cabeçalho.
+    """
+    vazio = ("", "", ""), [], {}
+    blocos = sorted(blocos, key=lambda b: b["inicio"])
+    if blocos[0]["erro_leitura"]: return (*vazio, blocos[0]["erro_leitura"])
+    n_paginas = blocos[0]["n_paginas"]
+    tipo = _classificar_documento(blocos[0]["primeira"], n_paginas) if n_paginas else "RESTRICOES"
+    if tipo is None:
+        return (*vazio, f"Arquivo {filename} ignorado: não parece uma CND nem um Relatório de Restrições.")
+    erro_leitura = next((b["erro_leitura"] for b in blocos if b["erro_leitura"]), None)
+    if erro_leitura: return (*vazio, erro_leitura)
+    paginas = [{"texto": t} for b in blocos for t in b["textos"]]
+    cnd = _extract_cnd_info_from_paginas(paginas)
+    if tipo == "CND": return cnd, [], {}, None
+    header_map = _header_map_from_paginas(paginas)
+    erro_parse = next((b["erro_parse"] for b in blocos if b["erro_parse"]), None)
+    if erro_parse: return cnd, [], header_map, erro_parse
+
+    itens, cnpj, org = [], None, None
+    for b in blocos:
+        # Contexto herdado: CNPJ/órgão correntes ao fim dos blocos anteriores
+        for item in b["itens"][:b["n_sem_cnpj"]]:
+            if "cnpj" in item: item["cnpj"] = _mask_cnpj_digits(cnpj)
+        for item in b["itens"][:b["n_sem_org"]]:
+            if "orgao" in item: item["orgao"] = org or ""
+        itens.extend(b["itens"])
+        if b["cnpj"] is not None: cnpj = b["cnpj"]
+        if b["org"] is not None: org = b["org"]
+    return cnd, itens, header_map, None
+
+def _extract_itens_from_stream(file_bytes, filename):
+    """Lê bytes do PDF e extrai itens de restrição."""
+    _, itens, _, erro = _extract_pdf_completo(file_bytes, filename)
+    if erro: logger.error(erro)
+    return itens
+
+def _extract_cnd_info_exact_stream(file_bytes):
+    with _PaginasPDF(file_bytes) as paginas:
+        return _extract_cnd_info_from_paginas(paginas)
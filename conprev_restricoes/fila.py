@@ -0,0 +1,208 @@
+"""Fila de lotes em segundo plano, com estado e ZIP de saída gravados em disco.
+
+Cada lote enviado vira um job com ID. O processamento roda numa thread de um pool
+limitado (CONPREV_JOBS_MAX lotes ao mesmo tempo) e o estado (progresso, erros,
+perfil) fica em <diretório>/<id>/estado.json, junto do resultado.zip. Com isso o
+resultado sobrevive aos reruns do Streamlit e à recarga da página: basta o ID.
+Reenviar o mesmo lote (mesmos arquivos e opções) devolve o job já existente; os
+mesmos arquivos com outro filtro de municípios (ou outro logo) reaproveitam a extração
+e os relatórios em cache e a execução já gravada no histórico.
+"""
+import os
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import logging
+import threading
+from datetime import date, datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from .cnpj import _CNPJ_CACHE_DIR
+from .pipeline import processar_lote
+from .historico import HistoricoItens
+
+logger = logging.getLogger(__name__)
+
+_MAX_SIMULTANEOS = int(os.environ.get("CONPREV_JOBS_MAX", "2"))
+_RETENCAO_S = float(os.environ.get("CONPREV_JOBS_TTL_H", "24")) * 3600
+_INTERVALO_GRAVACAO = 0.5  # s mínimos entre gravações do progresso em disco
+
+NA_FILA, PROCESSANDO, CONCLUIDO, FALHOU = "na_fila", "processando", "concluido", "falhou"
+_FINAIS = (CONCLUIDO, FALHOU)
+
+def _agora():
+    return datetime.now().isoformat(timespec="seconds")
+
+class FilaLotes:
+    """Executa lotes (processar_lote) em segundo plano e guarda estado e ZIP por ID."""
+
+    def __init__(self, diretorio=None, max_simultaneos=_MAX_SIMULTANEOS, retencao_s=_RETENCAO_S):
+        self.diretorio = diretorio or os.path.join(_CNPJ_CACHE_DIR, "lotes")
+        self.retencao_s = retencao_s
+        os.makedirs(self.diretorio, exist_ok=True)
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_simultaneos), thread_name_prefix="conprev-lote")
+        self._estados = {}         # id -> estado dos jobs deste processo
+        self._por_assinatura = {}  # assinatura do lote -> id
+        self._execucoes = {}       # assinatura dos arquivos -> execução gravada no histórico
+        self._lock = threading.Lock()
+        self.limpar_antigos()
+
+    def _pasta(self, job_id):
+        return os.path.join(self.diretorio, job_id)
+
+    def caminho_zip(self, job_id):
+        return os.path.join(self._pasta(job_id), "resultado.zip")
+
+    def _gravar(self, estado):
+        # Escrita atômica: quem lê nunca vê um estado.json pela metade
+        pasta = self._pasta(estado["id"])
+        tmp = os.path.join(pasta, "estado.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(estado, f, ensure_ascii=False)
+        os.replace(tmp, os.path.join(pasta, "estado.json"))
+
+    def _atualizar(self, job_id, **campos):
+        with self._lock:
+            estado = self._estados[job_id]
+            estado.update(campos)
+            self._gravar(estado)
+
+    @staticmethod
+    def assinatura_arquivos(arquivos):
+        """Identifica os arquivos do lote (nomes e conteúdo) e a data."""
+        h = hashlib.sha256(date.today().isoformat().encode("utf-8"))
+        for nome, file_bytes in arquivos:
+            h.update(nome.encode("utf-8"))
+            h.update(hashlib.sha256(file_bytes).digest())
+        return h.hexdigest()
+
+    @classmethod
+    def assinatura(cls, arquivos, municipios, logo_bytes=None, offline=None, historico=False):
+        """Identifica o lote pelo conteúdo dos arquivos, opções que mudam a saída e a data."""
+        return cls._assinatura_lote(cls.assinatura_arquivos(arquivos), municipios, logo_bytes, offline, historico)
+
+    @staticmethod
+    def _assinatura_lote(de_arquivos, municipios, logo_bytes, offline, historico):
+        h = hashlib.sha256(de_arquivos.encode("utf-8"))
+        h.update(json.dumps([list(municipios), offline, historico]).encode("utf-8"))
+        h.update(hashlib.sha256(logo_bytes or b"").digest())
+        return h.hexdigest()
+
+    def enviar(self, arquivos, municipios, logo_bytes=None, workers=1, offline=None, historico=False, meta=None):
+        """Agenda o lote e retorna o ID do job (o de um lote idêntico ainda válido, se houver).
+
+        Com historico, a execução é gravada no histórico padrão e o ZIP inclui as Novidades.
+        'meta' (dict) é guardado no estado para a interface (ex.: UFs selecionadas).
+        """
+        self.limpar_antigos()
+        de_arquivos = self.assinatura_arquivos(arquivos)
+        assinatura = self._assinatura_lote(de_arquivos, municipios, logo_bytes, offline, historico)
+        with self._lock:
+            anterior = self._por_assinatura.get(assinatura)
+            if anterior is not None:
+                estado = self._estados[anterior]
+                if estado["status"] not in _FINAIS or (estado["status"] == CONCLUIDO and os.path.exists(self.caminho_zip(anterior))):
+                    return anterior
+            job_id = uuid.uuid4().hex[:12]
+            os.makedirs(self._pasta(job_id))
+            estado = {
+                "id": job_id, "status": NA_FILA, "progresso": 0.0, "mensagem": "Aguardando na fila...",
+                "criado_em": _agora(), "concluido_em": None,
+                "erros": [], "arquivos_usados": 0, "total_arquivos": len(arquivos), "duplicatas": 0,
+                "perfil": None, "meta": meta or {},
+            }
+            self._gravar(estado)
+            self._estados[job_id] = estado
+            self._por_assinatura[assinatura] = job_id
+        self._pool.submit(self._executar, job_id, arquivos, municipios, logo_bytes, workers, offline,
+                          historico, de_arquivos)
+        return job_id
+
+    def _executar(self, job_id, arquivos, municipios, logo_bytes, workers, offline, historico, de_arquivos=None):
+        ultima_gravacao = [0.0]
+
+        def progresso(fracao, mensagem):
+            agora = time.monotonic()
+            with self._lock:
+                estado = self._estados[job_id]
+                estado.update(progresso=min(fracao, 1.0), mensagem=mensagem)
+                if agora - ultima_gravacao[0] >= _INTERVALO_GRAVACAO:
+                    ultima_gravacao[0] = agora
+                    self._gravar(estado)
+
+        self._atualizar(job_id, status=PROCESSANDO, mensagem="Iniciando...")
+        destino = self.caminho_zip(job_id)
+        try:
+            # O ZIP só aparece com o nome final quando estiver completo
+            # Mesmos arquivos de um lote anterior (só o filtro mudou): sem nova execução no histórico
+            with self._lock:
+                execucao = self._execucoes.get(de_arquivos) if historico else None
+            resumo = processar_lote(arquivos, municipios, destino + ".tmp", logo_bytes=logo_bytes,
+                                    workers=workers, offline=offline, progresso=progresso,
+                                    historico=HistoricoItens() if historico else None,
+                                    reaproveitar_execucao=execucao)
+            os.replace(destino + ".tmp", destino)
+            if resumo["execucao_historico"] is not None:
+                with self._lock:
+                    self._execucoes[de_arquivos] = resumo["execucao_historico"]
+        except Exception as e:
+            logger.exception("Falha no lote %s", job_id)
+            self._atualizar(job_id, status=FALHOU, mensagem=f"Falha no processamento: {e}", concluido_em=_agora())
+            return
+        self._atualizar(
+            job_id, status=CONCLUIDO, progresso=1.0, mensagem="Processamento concluído!", concluido_em=_agora(),
+            erros=resumo["erros"], arquivos_usados=resumo["arquivos_usados"],
+            total_arquivos=resumo["total_arquivos"], duplicatas=resumo["duplicatas"], perfil=resumo["perfil"].resumo(),
+        )
+
+    def estado(self, job_id):
+        """Cópia do estado do job (deste processo ou gravado em disco), ou None se não existir."""
+        with self._lock:
+            estado = self._estados.get(job_id)
+            if estado is not None: return dict(estado)
+        if not (job_id and job_id.isalnum()): return None  # o ID pode vir da URL
+        try:
+            with open(os.path.join(self._pasta(job_id), "estado.json"), encoding="utf-8") as f:
+                estado = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if estado["status"] not in _FINAIS:
+            # Job de um processo anterior (servidor reiniciado) que não chegou ao fim
+            estado.update(status=FALHOU, mensagem="Processamento interrompido (servidor reiniciado). Envie o lote novamente.")
+        return estado
+
+    def limpar_antigos(self):
+        """Remove jobs finalizados há mais de retencao_s segundos (pasta e estado em memória)."""
+        limite = time.time() - self.retencao_s
+        with self._lock:
+            ativos = {j for j, e in self._estados.items() if e["status"] not in _FINAIS}
+        removidos = set()
+        for nome in os.listdir(self.diretorio):
+            pasta = self._pasta(nome)
+            if nome in ativos: continue
+            try:
+                mtime = os.path.getmtime(os.path.join(pasta, "estado.json"))
+            except OSError:
+                try: mtime = os.path.getmtime(pasta)
+                except OSError: continue
+            if mtime < limite:
+                shutil.rmtree(pasta, ignore_errors=True)
+                removidos.add(nome)
+        if not removidos: return
+        # Sem a pasta o ZIP sumiu: o job passa a "não encontrado" e reenviar o lote cria outro
+        with self._lock:
+            for job_id in removidos: self._estados.pop(job_id, None)
+            for assinatura in [a for a, j in self._por_assinatura.items() if j in removidos]:
+                del self._por_assinatura[assinatura]
+
+_FILA = None
+_FILA_LOCK = threading.Lock()
+
+def fila_padrao():
+    """Fila compartilhada pelo processo (todas as sessões do Streamlit usam a mesma)."""
+    global _FILA
+    with _FILA_LOCK:
+        if _FILA is None: _FILA = FilaLotes()
+        return _FILA
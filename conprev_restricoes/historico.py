@@ -0,0 +1,175 @@
+"""Histórico de itens entre lotes (SQLite) e consulta de novidades entre execuções.
+
+Cada execução do pipeline grava os itens extraídos, identificados por
+(município, CNPJ, tipo, código, competência) e indexados por essa chave. As novidades
+de uma execução (itens novos, resolvidos e com valor alterado) são calculadas por
+município e CNPJ contra a execução anterior que teve documento daquele CNPJ no
+município, sem reabrir ZIPs nem PDFs antigos.
+"""
+import os
+import sqlite3
+from datetime import datetime
+
+from .armazem import _chave_item
+from .cnpj import _CNPJ_CACHE_DIR, _cnpj_digits
+
+_HISTORICO_DB = os.path.join(_CNPJ_CACHE_DIR, "historico.sqlite3")
+
+# Valor comparado entre execuções, por tipo de item (centavos)
+_CAMPO_VALOR = {"DEVEDOR": "cons", "MAED": "dev"}
+
+NOVO, RESOLVIDO, ALTERADO = "NOVO", "RESOLVIDO", "ALTERADO"
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS execucoes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    criada_em TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS execucao_municipios (
+    execucao INTEGER NOT NULL,
+    municipio TEXT NOT NULL,
+    PRIMARY KEY (municipio, execucao)
+);
+CREATE TABLE IF NOT EXISTS execucao_cnpjs (
+    execucao INTEGER NOT NULL,
+    municipio TEXT NOT NULL,
+    cnpj TEXT NOT NULL,
+    PRIMARY KEY (municipio, cnpj, execucao)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS itens (
+    execucao INTEGER NOT NULL,
+    municipio TEXT NOT NULL,
+    cnpj TEXT NOT NULL,
+    tipo TEXT NOT NULL,
+    cod TEXT NOT NULL,
+    comp TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    descricao TEXT,
+    orgao TEXT,
+    valor INTEGER,
+    PRIMARY KEY (execucao, municipio, cnpj, tipo, cod, comp, seq)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS itens_chave ON itens (municipio, cnpj, tipo, cod, comp);
+"""
+
+# Novidades de uma execução: cada (município, CNPJ) é comparado com a execução anterior
+# que teve documento daquele CNPJ no município; CNPJ sem documento numa das duas
+# execuções não é comparado. A chave inclui 'seq' para parear itens repetidos na mesma ordem.
+_SQL_NOVIDADES = """
+WITH pares AS (
+    SELECT ec.municipio, ec.cnpj, ec.execucao AS atual,
+           (SELECT MAX(p.execucao) FROM execucao_cnpjs p
+             WHERE p.municipio = ec.municipio AND p.cnpj = ec.cnpj AND p.execucao < ec.execucao) AS anterior
+      FROM execucao_cnpjs ec WHERE ec.execucao = :execucao
+)
+SELECT CASE WHEN b.tipo IS NULL THEN 'NOVO' ELSE 'ALTERADO' END,
+       a.municipio, a.cnpj, a.tipo, a.cod, a.comp, a.descricao, a.orgao, b.valor, a.valor
+  FROM pares
+  JOIN itens a ON a.execucao = pares.atual AND a.municipio = pares.municipio AND a.cnpj = pares.cnpj
+  LEFT JOIN itens b ON b.execucao = pares.anterior AND b.municipio = a.municipio AND b.cnpj = a.cnpj
+                   AND b.tipo = a.tipo AND b.cod = a.cod AND b.comp = a.comp AND b.seq = a.seq
+ WHERE pares.anterior IS NOT NULL AND (b.tipo IS NULL OR b.valor IS NOT a.valor)
+UNION ALL
+SELECT 'RESOLVIDO',
+       b.municipio, b.cnpj, b.tipo, b.cod, b.comp, b.descricao, b.orgao, b.valor, NULL
+  FROM pares
+  JOIN itens b ON b.execucao = pares.anterior AND b.municipio = pares.municipio AND b.cnpj = pares.cnpj
+  LEFT JOIN itens a ON a.execucao = pares.atual AND a.municipio = b.municipio AND a.cnpj = b.cnpj
+                   AND a.tipo = b.tipo AND a.cod = b.cod AND a.comp = b.comp AND a.seq = b.seq
+ WHERE a.tipo IS NULL
+ ORDER BY 2, 1, 4, 5, 6
+"""
+
+_SQL_SEM_BASE = """
+SELECT em.municipio FROM execucao_municipios em
+ WHERE em.execucao = ? AND NOT EXISTS (
+       SELECT 1 FROM execucao_municipios p WHERE p.municipio = em.municipio AND p.execucao < em.execucao)
+ ORDER BY em.municipio
+"""
+
+class HistoricoItens:
+    """Banco SQLite com os itens de todas as execuções registradas."""
+
+    def __init__(self, caminho=None):
+        self.caminho = caminho or _HISTORICO_DB
+
+    def _conn(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.caminho)), exist_ok=True)
+        conn = sqlite3.connect(self.caminho, timeout=30)
+        conn.executescript(_ESQUEMA)
+        if conn.execute("PRAGMA user_version").fetchone()[0] < 1:
+            # Bancos anteriores à cobertura por CNPJ: cobertura = CNPJs com itens gravados
+            with conn:
+                conn.execute("INSERT OR IGNORE INTO execucao_cnpjs (execucao, municipio, cnpj) "
+                             "SELECT DISTINCT execucao, municipio, cnpj FROM itens")
+                conn.execute("PRAGMA user_version = 1")
+        return conn
+
+    def registrar(self, armazem, municipios, quando=None, cobertura=None):
+        """Grava os itens do armazém como uma nova execução e retorna o ID dela.
+
+        'municipios' são os que tiveram arquivo neste lote: só eles entram na
+        comparação (município ausente do lote não tem seus itens dados como resolvidos).
+        'cobertura' ({município: CNPJs}, ver roteamento.cnpjs_do_documento) diz de quais
+        CNPJs o lote teve documento; só eles são comparados, para a falta do relatório de
+        um órgão não dar os itens dele como resolvidos. Os CNPJs dos itens sempre contam.
+        """
+        municipios = set(municipios)
+        cobertos = {(m, d) for m, cnpjs in (cobertura or {}).items() if m in municipios for d in cnpjs}
+        linhas, contagem = [], {}
+        for r in armazem:
+            mun = r.municipio
+            if mun not in municipios: continue
+            tipo = r.get("tipo", "")
+            cod, comp = _chave_item(r)
+            chave = (mun, _cnpj_digits(r.get("cnpj")), tipo, cod, comp)
+            seq = contagem[chave] = contagem.get(chave, -1) + 1
+            cobertos.add(chave[:2])
+            campo = _CAMPO_VALOR.get(tipo)
+            linhas.append((*chave, seq, r.get("nome") or r.get("desc") or "", r.get("orgao") or "",
+                           r.centavos(campo) if campo else None))
+        conn = self._conn()
+        try:
+            with conn:
+                quando = (quando or datetime.now()).isoformat(timespec="seconds")
+                execucao = conn.execute("INSERT INTO execucoes (criada_em) VALUES (?)", (quando,)).lastrowid
+                conn.executemany("INSERT INTO execucao_municipios (execucao, municipio) VALUES (?, ?)",
+                                 [(execucao, m) for m in sorted(municipios)])
+                conn.executemany("INSERT INTO execucao_cnpjs (execucao, municipio, cnpj) VALUES (?, ?, ?)",
+                                 [(execucao, m, d) for m, d in sorted(cobertos)])
+                conn.executemany(
+                    "INSERT INTO itens (execucao, municipio, cnpj, tipo, cod, comp, seq, descricao, orgao, valor) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", [(execucao, *l) for l in linhas])
+        finally:
+            conn.close()
+        return execucao
+
+    def municipios(self, execucao):
+        """Municípios que entraram na execução."""
+        conn = self._conn()
+        try:
+            return {m for (m,) in conn.execute("SELECT municipio FROM execucao_municipios WHERE execucao = ?", (execucao,))}
+        finally:
+            conn.close()
+
+    def novidades(self, execucao, municipios=None):
+        """Itens novos, resolvidos e com valor alterado na execução, por município.
+
+        Retorna (mudancas, sem_base): mudancas é uma lista de dicts (situacao, municipio,
+        cnpj, tipo, cod, comp, descricao, orgao, valor_anterior, valor_atual) e sem_base
+        lista os municípios sem execução anterior para comparar. Com 'municipios', só os
+        desses municípios.
+        """
+        conn = self._conn()
+        try:
+            campos = ("situacao", "municipio", "cnpj", "tipo", "cod", "comp", "descricao", "orgao",
+                      "valor_anterior", "valor_atual")
+            mudancas = [dict(zip(campos, l)) for l in conn.execute(_SQL_NOVIDADES, {"execucao": execucao})]
+            sem_base = [m for (m,) in conn.execute(_SQL_SEM_BASE, (execucao,))]
+        finally:
+            conn.close()
+        if municipios is not None:
+            municipios = set(municipios)
+            mudancas = [d for d in mudancas if d["municipio"] in municipios]
+            sem_base = [m for m in sem_base if m in municipios]
+        return mudancas, sem_base
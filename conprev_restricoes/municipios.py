@@ -0,0 +1,203 @@
+"""Cadastro de municípios atendidos e casamento de nomes de arquivo com municípios."""
+import re
+import unicodedata
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from difflib import SequenceMatcher
+
+MUNICIPIOS_POR_UF = {
+    "GO": [
+        "Amaralina", "Baliza", "Barro Alto", "Bela Vista de Goiás", "Brazabrantes", 
+        "Buriti Alegre", "Caiapônia", "Catalão", "Campinaçu", "Ceres", "Córrego do Ouro", 
+        "Corumba de Goiás", "Cristalina", "Crixás", "Goiás", "Goiatuba", "Hidrolina", 
+        "Itaberaí", "Itapaci", "Jaraguá", "Montes Claros de Goiás", "Nerópolis", 
+        "Novo Gama", "Paranaiguara", "Perolândia", "Pilar de Goiás", "Piranhas", 
+        "Rianápolis", "Rio Quente", "Serranópolis", "São Francisco de Goiás", 
+        "São Luís Montes Belos", "Teresina de Goiás", "Trindade", "Uirapuru"
+    ],
+    "TO": [
+        "Aguiarnópolis", "Almas", "Bandeirantes do Tocantins", "Barra do Ouro", 
+        "Brejinho de Nazaré", "Cristalândia", "Goianorte", "Guaraí", "Jaú do Tocantins", 
+        "Lajeado", "Maurilândia do Tocantins", "Natividade", "Palmeiras do Tocantins", 
+        "Palmeirópolis", "Paraíso do Tocantins", "Paranã", "Pedro Afonso", "Peixe", 
+        "Santa Maria do Tocantins", "Santa Rita do Tocantins", "São Valério", "Silvanópolis"
+    ],
+    "MS": [
+        "Alcinópolis", "Anastácio", "Chapadão do Sul", "Coxim", "Iguatemi", 
+        "Japorã", "Jaraguari", "Sete Quedas", "Sonora", "Tacuru"
+    ],
+}
+
+_STOPWORDS_MUN = {"de", "da", "do", "das", "dos", "municipio", "municipio de", "camara", "prefeitura", "municipal"}
+
+def normalizar(s: str) -> str:
+    t = unicodedata.normalize("NFKD", str(s))
+    return t.encode("ascii", "ignore").decode().lower().strip()
+
+def _canon_mun(s: str) -> str:
+    if s is None: return ""
+    s = unicodedata.normalize("NFKD", str(s)).encode("ascii", "ignore").decode().lower()
+    s = re.sub(r"[^a-z0-9]+", " ", s)
+    tokens = [t for t in s.split() if t and t not in _STOPWORDS_MUN]
+    return "".join(tokens)
+
+def _tokens_mun(s: str) -> set:
+    s = unicodedata.normalize("NFKD", str(s)).encode("ascii", "ignore").decode().lower()
+    s = re.sub(r"[^a-z0-9]+", " ", s)
+    return {t for t in s.split() if t and t not in _STOPWORDS_MUN}
+
+def corresponde_municipio(base_norm: str, mun_norm: str) -> bool:
+    if mun_norm == "goias":
+        tok_b = _tokens_mun(base_norm)
+        if "goias" not in tok_b: return False
+        extras = {"go"}
+        significativos = {t for t in tok_b if t != "goias" and t not in extras}
+        return not significativos
+
+    cb = _canon_mun(base_norm)
+    cm = _canon_mun(mun_norm)
+    if not cb or not cm: return False
+    if cm in cb: return True
+    
+    tok_m = _tokens_mun(mun_norm)
+    tok_b = _tokens_mun(base_norm)
+    if tok_m and tok_m.issubset(tok_b): return True
+    
+    ratio = SequenceMatcher(None, cm, cb).ratio()
+    return ratio >= 0.90
+
+def municipios_das_ufs(ufs) -> list:
+    """Lista unificada dos municípios das UFs informadas, na ordem do cadastro."""
+    todos = []
+    for uf in ufs:
+        todos.extend(MUNICIPIOS_POR_UF[uf])
+    return todos
+
+_LIMIAR_FUZZY = 0.90
+# ratio = 2*M/(|a|+|b|) <= 2*min/(|a|+|b|): abaixo desta proporção de tamanhos não chega a 0.90
+_PROPORCAO_MIN_FUZZY = _LIMIAR_FUZZY / (2 - _LIMIAR_FUZZY)
+
+def _trigramas(s: str) -> set:
+    return {s[k:k+3] for k in range(len(s) - 2)}
+
+class IndiceMunicipios:
+    """Índice pré-computado para casar nomes de arquivo com municípios.
+
+    Mesmas regras de corresponde_municipio (regra especial de "goias", substring
+    canônica, subconjunto de tokens e SequenceMatcher >= 0.90), mas com forma
+    canônica e tokens calculados uma única vez e candidatos filtrados por índices
+    invertidos de trigramas (substring), de tokens (subconjunto) e por tamanho (fuzzy).
+    """
+
+    def __init__(self, municipios):
+        self.nomes = []      # nome real, na ordem de entrada (desempate)
+        self._canon = []
+        self._tokens = []
+        self._n_trig = []
+        self._goias = []     # ids sujeitos apenas à regra especial
+        self._curtos = []    # ids com forma canônica curta demais para trigramas
+        self._por_trigrama = defaultdict(set)
+        self._por_token = defaultdict(set)
+        self._por_tamanho = []  # (len(canon), id), ordenado
+        for m in municipios:
+            if m in self.nomes: continue
+            i = len(self.nomes)
+            m_norm = normalizar(m)
+            cm = _canon_mun(m_norm)
+            tok_m = _tokens_mun(m_norm)
+            self.nomes.append(m); self._canon.append(cm); self._tokens.append(tok_m)
+            self._n_trig.append(len(_trigramas(cm)))
+            if m_norm == "goias":
+                self._goias.append(i)
+                continue
+            if not cm: continue
+            if len(cm) < 3: self._curtos.append(i)
+            for tg in _trigramas(cm): self._por_trigrama[tg].add(i)
+            for t in tok_m: self._por_token[t].add(i)
+            self._por_tamanho.append((len(cm), i))
+        self._por_tamanho.sort()
+        self._tamanhos = [n for n, _ in self._por_tamanho]
+
+    def pontuar(self, nome: str) -> dict:
+        """Retorna {id: pontuação} dos municípios que casam com 'nome'.
+
+        Regras exatas (goias, substring, subconjunto) pontuam (1, len(canon)), priorizando
+        o nome mais específico; o fuzzy pontua (0, ratio).
+        """
+        base_norm = normalizar(nome)
+        tok_b = _tokens_mun(base_norm)
+        cb = _canon_mun(base_norm)
+        pontos = {}
+
+        for i in self._goias:
+            if "goias" in tok_b and not {t for t in tok_b if t != "goias" and t != "go"}:
+                pontos[i] = (1, len(self._canon[i]))
+        if not cb: return pontos
+
+        # Substring canônica: todo trigrama de cm aparece em cb
+        trig_b = _trigramas(cb)
+        hits = defaultdict(int)
+        for tg in trig_b:
+            for i in self._por_trigrama.get(tg, ()):
+                hits[i] += 1
+        candidatos = {i for i, n in hits.items() if n == self._n_trig[i]}
+        candidatos.update(self._curtos)
+        for i in candidatos:
+            if self._canon[i] in cb:
+                pontos[i] = (1, len(self._canon[i]))
+
+        # Subconjunto de tokens
+        hits = defaultdict(int)
+        for t in tok_b:
+            for i in self._por_token.get(t, ()):
+                hits[i] += 1
+        for i, n in hits.items():
+            if i not in pontos and n == len(self._tokens[i]):
+                pontos[i] = (1, len(self._canon[i]))
+
+        # Fuzzy: só tamanhos compatíveis, com os limites baratos do SequenceMatcher antes do ratio()
+        lo = bisect_left(self._tamanhos, len(cb) * _PROPORCAO_MIN_FUZZY)
+        hi = bisect_right(self._tamanhos, len(cb) / _PROPORCAO_MIN_FUZZY)
+        sm = SequenceMatcher(None)
+        sm.set_seq2(cb)
+        for _, i in self._por_tamanho[lo:hi]:
+            if i in pontos: continue
+            sm.set_seq1(self._canon[i])
+            if sm.real_quick_ratio() < _LIMIAR_FUZZY or sm.quick_ratio() < _LIMIAR_FUZZY: continue
+            ratio = sm.ratio()
+            if ratio >= _LIMIAR_FUZZY:
+                pontos[i] = (0, ratio)
+        return pontos
+
+    def melhor(self, nome: str, permitidos=None, exato=False):
+        """Município de melhor pontuação para 'nome' (restrito a 'permitidos', se informado).
+
+        Com exato=True, só as regras exatas contam (o casamento fuzzy é ignorado).
+        """
+        melhor_id, melhor_pts = None, None
+        for i, pts in self.pontuar(nome).items():
+            if permitidos is not None and self.nomes[i] not in permitidos: continue
+            if exato and not pts[0]: continue
+            if melhor_pts is None or pts > melhor_pts or (pts == melhor_pts and i < melhor_id):
+                melhor_id, melhor_pts = i, pts
+        return None if melhor_id is None else self.nomes[melhor_id]
+
+_INDICE_PADRAO = None
+
+def indice_municipios() -> IndiceMunicipios:
+    """Índice de todos os municípios de MUNICIPIOS_POR_UF, construído uma única vez."""
+    global _INDICE_PADRAO
+    if _INDICE_PADRAO is None:
+        _INDICE_PADRAO = IndiceMunicipios(m for lista in MUNICIPIOS_POR_UF.values() for m in lista)
+    return _INDICE_PADRAO
+
+def encontrar_municipio(nome_arquivo: str, municipios, exato=False):
+    """Município (entre 'municipios') que melhor casa com o nome do arquivo, ou None.
+
+    Com exato=True, ignora o casamento aproximado (fuzzy).
+    """
+    permitidos = set(municipios)
+    indice = indice_municipios()
+    if not permitidos.issubset(indice.nomes):
+        indice = IndiceMunicipios(municipios)
+    return indice.melhor(nome_arquivo, permitidos, exato)
@@ -0,0 +1,221 @@
+"""Execução em pool de processos da extração e da renderização dos relatórios."""
+import os
+import time
+import multiprocessing
+from collections import deque
+from functools import partial
+from concurrent.futures import Future, ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from .cache import cache_padrao
+from .entrada import normalizar_entradas, _ERROS_LEITURA
+from .extracao import _extract_pdf_completo, _planejar_blocos, _extrair_bloco, _costurar_blocos
+from .perfil import medir, cronometro
+from .relatorios import (
+    gerar_pdf_individual, gerar_pdf_gerencial_maed,
+    gerar_pdf_gerencial_devedor, gerar_pdf_validade_cnd, gerar_pdf_novidades,
+)
+
+# "spawn": o servidor do Streamlit é multi-thread, e fork de processo com threads é frágil
+_MP_CONTEXT = multiprocessing.get_context("spawn")
+
+def workers_padrao() -> int:
+    env = os.environ.get("CONPREV_WORKERS", "").strip()
+    if env.isdigit() and int(env) > 0: return int(env)
+    return max(1, min(os.cpu_count() or 1, 8))
+
+def _novo_pool(workers):
+    return ProcessPoolExecutor(max_workers=workers, mp_context=_MP_CONTEXT)
+
+def _tarefa_extrair(args):
+    nome, file_bytes = args
+    tempos = {}
+    return _extract_pdf_completo(file_bytes, nome, resolver_nomes=False, tempos=tempos), tempos
+
+def _tarefa_extrair_bloco(args):
+    nome, file_bytes, inicio, fim = args
+    tempos = {}
+    return _extrair_bloco(file_bytes, nome, inicio, fim, tempos=tempos), tempos
+
+def _somar_tempos(lista):
+    total = {}
+    for tempos in lista:
+        for etapa, segundos in tempos.items(): total[etapa] = total.get(etapa, 0.0) + segundos
+    return total
+
+def extrair_arquivos(entradas, workers=1, usar_cache=True, perfil=None):
+    """Extrai (cnd, itens, header_map, erro) de cada entrada, na ordem de entrada.
+
+    'entradas' é uma lista de entradas (ver entrada.py) ou de (nome, bytes). É um
+    gerador: com workers > 1 os arquivos são processados em paralelo, mas os
+    resultados saem na mesma ordem, para o merge ser determinístico. Cada PDF é lido
+    só quando entra na janela de trabalho (até 2 por processo), então a memória
+    fica limitada mesmo em lotes com centenas de arquivos.
+    Relatórios longos (a partir de _BYTES_MIN_DIVISAO bytes e 2 blocos de _PAGINAS_POR_BLOCO
+    páginas) são divididos em blocos de páginas extraídos em paralelo e costurados em
+    ordem (ver extracao._planejar_blocos e _costurar_blocos), com o mesmo resultado do
+    parse sequencial.
+    Com cache, só os PDFs novos ou alterados (por hash do conteúdo) passam pelo parser.
+    Os tempos de cada etapa (medidos também nos processos do pool) vão para 'perfil'.
+    """
+    entradas = normalizar_entradas(entradas)
+    cache = cache_padrao() if usar_cache else None
+    ex = None  # pool criado só quando a primeira tarefa vai para ele
+    limite = 2 * workers if workers > 1 else 0
+    janela = deque()  # (nome, chave do cache, resultado pronto, Future ou lista de Futures, veio do parser?)
+    em_andamento = 0  # tarefas do pool na janela
+
+    def enviar(funcao, args):
+        nonlocal ex, em_andamento
+        if ex is None: ex = _novo_pool(workers)
+        em_andamento += 1
+        return ex.submit(funcao, args)
+
+    def concluir(nome, chave, pendente, novo):
+        nonlocal em_andamento
+        if not novo: return pendente
+        if isinstance(pendente, list):  # blocos de páginas de um relatório longo
+            partes = [fut.result() for fut in pendente]
+            em_andamento -= len(partes)
+            tempos = _somar_tempos(t for _, t in partes)
+            with cronometro(tempos, "costurar_blocos"):
+                res = _costurar_blocos([b for b, _ in partes], nome)
+        elif isinstance(pendente, Future):
+            (res, tempos), em_andamento = pendente.result(), em_andamento - 1
+        else:
+            res, tempos = pendente
+        if perfil is not None: perfil.registrar_varios(tempos, nome)
+        if cache is not None:
+            with medir(perfil, "cache", nome):
+                cache.put(chave, res)
+        return res
+
+    try:
+        for entrada in entradas:
+            nome = entrada.nome
+            try:
+                with medir(perfil, "ler_entrada", nome):
+                    file_bytes = entrada.ler()
+            except _ERROS_LEITURA as e:
+                # Membro corrompido ou arquivo sumido: erro só deste arquivo (e fora do cache)
+                janela.append((nome, None, (("", "", ""), [], {}, f"Erro ao ler PDF {nome}: {e}"), False))
+                continue
+            chave = res = None
+            if cache is not None:
+                with medir(perfil, "cache", nome):
+                    chave = cache.chave(file_bytes)
+                    res = cache.get(chave, nome)
+            blocos = _planejar_blocos(file_bytes, workers) if res is None else []
+            if res is not None:
+                janela.append((nome, chave, res, False))
+            elif len(blocos) > 1:
+                janela.append((nome, chave, [enviar(_tarefa_extrair_bloco, (nome, file_bytes, inicio, fim))
+                                             for inicio, fim in blocos], True))
+            elif workers > 1 and len(entradas) > 1:
+                janela.append((nome, chave, enviar(_tarefa_extrair, (nome, file_bytes)), True))
+            else:
+                janela.append((nome, chave, _tarefa_extrair((nome, file_bytes)), True))
+            del file_bytes
+            while janela and (em_andamento > limite or len(janela) > limite):
+                yield concluir(*janela.popleft())
+        while janela:
+            yield concluir(*janela.popleft())
+    finally:
+        if ex is not None: ex.shutdown(cancel_futures=True)
+
+def _tarefa_renderizar(tarefa):
+    funcao, args = tarefa
+    t0 = time.perf_counter()
+    pdf_bytes = funcao(*args)
+    return pdf_bytes, time.perf_counter() - t0
+
+def caminho_individual(mun):
+    """Caminho no ZIP do relatório individual do município."""
+    return f"Relatorios_Individuais/{mun.replace(' ', '_')}_Analise.pdf"
+
+def _recorte_municipio(armazem, mun, fonte, logo_bytes):
+    return armazem.filtrar(municipio=mun), mun, fonte, logo_bytes
+
+def tarefas_relatorios(armazem, fontes_encontradas, lista_cnd, logo_bytes, novidades=None):
+    """Lista (caminho no ZIP, função, args) de todos os relatórios do lote, em ordem fixa.
+
+    'novidades' é o par (mudancas, sem_base) do histórico; sem ele não há relatório de Novidades.
+
+    Os gerenciais (lote inteiro, os mais demorados) vêm primeiro, para não sobrarem
+    no fim da renderização paralela. Cada relatório individual recebe só o recorte do
+    município (armazém compacto), o que reduz o volume enviado aos processos do pool;
+    o recorte é feito só quando a tarefa é enviada ('args' chamável). Os 'args' são
+    todas as entradas do relatório: é por eles que o CacheRelatorios decide o que refazer.
+    """
+    tarefas = [
+        ("Relatorios_Gerenciais/MAEDS_Consolidado.pdf", gerar_pdf_gerencial_maed, (armazem, logo_bytes)),
+        ("Relatorios_Gerenciais/DEVEDORES_Consolidado.pdf", gerar_pdf_gerencial_devedor, (armazem, logo_bytes)),
+        ("Relatorios_Gerenciais/Validade_CNDs.pdf", gerar_pdf_validade_cnd, (lista_cnd, logo_bytes)),
+    ]
+    if novidades is not None:
+        tarefas.append(("Relatorios_Gerenciais/Novidades.pdf", gerar_pdf_novidades, (*novidades, logo_bytes)))
+    for mun in armazem.agrupar("municipio"):
+        if mun is None: continue
+        tarefas.append((caminho_individual(mun), gerar_pdf_individual,
+                        partial(_recorte_municipio, armazem, mun, fontes_encontradas[mun], logo_bytes)))
+    return tarefas
+
+def renderizar_relatorios(tarefas, workers=1, perfil=None, cache=None):
+    """Gera os PDFs das tarefas e produz (caminho, pdf_bytes) à medida que ficam prontos.
+
+    Com workers > 1, no máximo 2 tarefas por processo ficam em andamento e cada PDF sai
+    assim que termina (não na ordem das tarefas), então a memória não cresce com o
+    número de municípios. Sem pool, a ordem é a das tarefas.
+    Com 'cache' (CacheRelatorios), relatórios com as mesmas entradas saem do cache sem
+    renderizar (etapa "relatorio_em_cache" do perfil).
+    O tempo de cada gerar_pdf_* vai para 'perfil', na etapa com o nome da função.
+    """
+    def preparar(caminho, funcao, args):
+        """(chave do cache, args resolvidos, PDF em cache ou None)."""
+        args = args() if callable(args) else args
+        if cache is None: return None, args, None
+        with medir(perfil, "relatorio_em_cache", caminho):
+            chave = cache.chave(funcao, args)
+            return chave, args, cache.get(chave)
+
+    def concluir(caminho, funcao, chave, resultado):
+        pdf_bytes, segundos = resultado
+        if perfil is not None: perfil.registrar(funcao.__name__, segundos)
+        if chave is not None: cache.put(chave, pdf_bytes)
+        return caminho, pdf_bytes
+
+    if workers <= 1 or len(tarefas) <= 1:
+        for caminho, funcao, args in tarefas:
+            chave, args, pdf_bytes = preparar(caminho, funcao, args)
+            if pdf_bytes is not None: yield caminho, pdf_bytes
+            else: yield concluir(caminho, funcao, chave, _tarefa_renderizar((funcao, args)))
+        return
+
+    ex = _novo_pool(min(workers, len(tarefas)))
+    fila = enumerate(tarefas)
+    pendentes = {}  # Future -> (ordem, caminho, função, chave do cache)
+    em_cache = []   # (caminho, pdf_bytes) encontrados no cache, ainda não produzidos
+
+    def enviar(n):
+        while n > 0:
+            proxima = next(fila, None)
+            if proxima is None: return
+            ordem, (caminho, funcao, args) = proxima
+            chave, args, pdf_bytes = preparar(caminho, funcao, args)
+            if pdf_bytes is not None:
+                em_cache.append((caminho, pdf_bytes))
+                continue
+            pendentes[ex.submit(_tarefa_renderizar, (funcao, args))] = (ordem, caminho, funcao, chave)
+            n -= 1
+
+    try:
+        enviar(2 * workers)
+        while pendentes or em_cache:
+            while em_cache: yield em_cache.pop(0)
+            if not pendentes: break
+            prontos, _ = wait(pendentes, return_when=FIRST_COMPLETED)
+            for fut in sorted(prontos, key=lambda f: pendentes[f][0]):
+                _, caminho, funcao, chave = pendentes.pop(fut)
+                yield concluir(caminho, funcao, chave, fut.result())
+            enviar(2 * workers - len(pendentes))
+    finally:
+        ex.shutdown(cancel_futures=True)
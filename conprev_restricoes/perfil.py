@@ -0,0 +1,87 @@
+"""Medição de tempo por etapa do pipeline, com totais por arquivo e percentis."""
+import json
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+
+class PerfilLote:
+    """Acumula tempos (segundos) por etapa e por arquivo de um lote."""
+
+    def __init__(self):
+        self._tempos = defaultdict(list)  # etapa -> [segundos]
+        self._por_arquivo = defaultdict(lambda: defaultdict(float))
+        self._inicio = time.perf_counter()
+        self._fim = None
+
+    def registrar(self, etapa, segundos, arquivo=None):
+        self._tempos[etapa].append(segundos)
+        if arquivo is not None:
+            self._por_arquivo[arquivo][etapa] += segundos
+
+    def registrar_varios(self, tempos: dict, arquivo=None):
+        for etapa, segundos in tempos.items():
+            self.registrar(etapa, segundos, arquivo)
+
+    @contextmanager
+    def medir(self, etapa, arquivo=None):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registrar(etapa, time.perf_counter() - t0, arquivo)
+
+    def encerrar(self):
+        self._fim = time.perf_counter()
+
+    def resumo(self, top=10) -> dict:
+        """Totais e percentis por etapa e os 'top' arquivos mais lentos."""
+        etapas = {}
+        for etapa, valores in self._tempos.items():
+            ordenados = sorted(valores)
+            etapas[etapa] = {
+                "n": len(ordenados),
+                "total_s": round(sum(ordenados), 4),
+                "media_s": round(sum(ordenados) / len(ordenados), 4),
+                "p50_s": round(_percentil(ordenados, 50), 4),
+                "p90_s": round(_percentil(ordenados, 90), 4),
+                "p99_s": round(_percentil(ordenados, 99), 4),
+                "max_s": round(ordenados[-1], 4),
+            }
+        arquivos = sorted(
+            ({"arquivo": nome, "total_s": round(sum(por_etapa.values()), 4),
+              "etapas": {e: round(v, 4) for e, v in por_etapa.items()}}
+             for nome, por_etapa in self._por_arquivo.items()),
+            key=lambda a: a["total_s"], reverse=True,
+        )
+        fim = self._fim if self._fim is not None else time.perf_counter()
+        return {
+            "duracao_s": round(fim - self._inicio, 4),
+            "etapas": dict(sorted(etapas.items(), key=lambda kv: kv[1]["total_s"], reverse=True)),
+            "arquivos_mais_lentos": arquivos[:top],
+        }
+
+    def salvar_json(self, caminho, top=10):
+        with open(caminho, "w", encoding="utf-8") as f:
+            json.dump(self.resumo(top), f, ensure_ascii=False, indent=2)
+
+def _percentil(ordenados, p):
+    """Percentil pelo método nearest-rank sobre uma lista já ordenada."""
+    if not ordenados: return 0.0
+    k = max(0, min(len(ordenados) - 1, -(-p * len(ordenados) // 100) - 1))
+    return ordenados[int(k)]
+
+def medir(perfil, etapa, arquivo=None):
+    """Context manager de medição que não faz nada quando não há perfil."""
+    return perfil.medir(etapa, arquivo) if perfil is not None else nullcontext()
+
+@contextmanager
+def cronometro(tempos, etapa):
+    """Soma o tempo do bloco em tempos[etapa] (tempos pode ser None)."""
+    if tempos is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        tempos[etapa] = tempos.get(etapa, 0.0) + time.perf_counter() - t0
@@ -0,0 +1,176 @@
+"""Pipeline completo de um lote: extração, match de município, CNPJ e ZIP de saída.
+
+É o mesmo fluxo do botão "Processar Tudo" da interface e do comando de linha
+(conprev-restricoes run), sem nenhuma dependência do Streamlit.
+"""
+import zipfile
+from datetime import date
+
+from .armazem import ArmazemItens
+from .entrada import normalizar_entradas, _ERROS_LEITURA
+from .exportacao import exportar_dados, formatos_disponiveis
+from .utils import _parse_date_br_to_date
+from .municipios import encontrar_municipio
+from .roteamento import cnpjs_do_documento, roteamento_padrao
+from .perfil import PerfilLote
+from .cache import cache_relatorios_padrao
+from .paralelo import extrair_arquivos, tarefas_relatorios, renderizar_relatorios
+
+def _sem_progresso(fracao, mensagem):
+    pass
+
+def registro_cnd(nome_file, cnd, hoje):
+    """Linha da lista de validade das CNDs para o arquivo (None se ele não traz validade)."""
+    cnpj_cnd, val_cnd, nome_cnd = cnd
+    if not val_cnd: return None
+    data_obj = _parse_date_br_to_date(val_cnd)
+    dias = (data_obj - hoje).days if data_obj else None
+    return {"arquivo": nome_file, "nome": nome_cnd, "cnpj": cnpj_cnd, "validade": val_cnd, "dias": dias}
+
+def identificar_municipio(nome_file, cnd, itens, header_map, municipios, roteamento=None, erros=None):
+    """Município (entre 'municipios') do arquivo: pelos CNPJs do documento e, se eles
+    não decidirem, pelo nome do arquivo. None se o arquivo não é de nenhum deles.
+
+    O índice só aprende CNPJs de arquivos roteados pelos próprios CNPJs ou casados
+    pelo nome por uma regra exata (um casamento fuzzy errado ficaria gravado).
+    Arquivo cujos CNPJs apontam para um município fora da seleção gera uma mensagem em 'erros'.
+    """
+    cnpjs = cnpjs_do_documento(cnd, itens, header_map)
+    roteado = roteamento.municipio(cnpjs) if roteamento is not None else None
+    if roteado is None:
+        municipio = encontrar_municipio(nome_file, municipios)
+        confiavel = municipio is not None and encontrar_municipio(nome_file, [municipio], exato=True) == municipio
+    elif roteado not in municipios:
+        if erros is not None:
+            erros.append(f"Arquivo {nome_file} ignorado: pelos CNPJs é de {roteado}, fora dos municípios selecionados.")
+        return None
+    else:
+        municipio, confiavel = roteado, True
+    if municipio and confiavel and roteamento is not None:
+        roteamento.aprender(cnpjs, municipio)
+    return municipio
+
+def processar_lote(arquivos, municipios_selecionados, zip_destino, logo_bytes=None,
+                   workers=1, offline=None, progresso=None, hoje=None, usar_cache=True, perfil=None,
+                   historico=None, usar_roteamento=True, formatos_dados=None, reaproveitar_execucao=None):
+    """Processa um lote de PDFs e grava o ZIP completo em zip_destino (caminho ou arquivo).
+
+    O ZIP é escrito de forma incremental em zip_destino; use um caminho (como a fila de
+    lotes faz) para não manter o lote inteiro em memória.
+
+    arquivos: lista de (nome, bytes), caminhos ou entradas (ver entrada.py); arquivos .zip
+    entram como os PDFs que contêm, lidos um a um. progresso(fracao, mensagem) é chamado a cada etapa.
+    Com usar_cache, PDFs já processados (mesmo conteúdo) reaproveitam a extração anterior,
+    e relatórios com as mesmas entradas de um lote anterior não são renderizados de novo.
+    Com usar_roteamento, o município de cada arquivo sai dos CNPJs do documento (índice
+    persistido, ver roteamento.py) e o nome do arquivo só é usado quando eles não decidem.
+    Com historico (HistoricoItens), os itens são gravados como uma nova execução e o ZIP
+    ganha o relatório de Novidades em relação à execução anterior de cada município
+    (por CNPJ: só os órgãos com documento nas duas execuções são comparados).
+    reaproveitar_execucao: ID de uma execução já gravada com os mesmos arquivos (ex.: o
+    mesmo lote com outro filtro de municípios); se ela inclui todos os municípios deste
+    lote, as Novidades saem dela e nenhuma execução nova é gravada.
+    formatos_dados: formatos ("jsonl", "csv", "parquet") da exportação de itens e CNDs
+    em Dados/ (ver exportacao.py); None = todos os disponíveis, () = nenhum.
+    Retorna um dict com armazem (ArmazemItens com os itens por município), fontes_encontradas, lista_cnd,
+    arquivos_usados, total_arquivos, duplicatas (itens repetidos entre arquivos, unificados),
+    erros (mensagens por arquivo), perfil
+    (PerfilLote com os tempos de cada etapa; um novo é criado se não for informado)
+    e execucao_historico (ID da execução gravada ou reaproveitada, ou None sem histórico).
+    """
+    progresso = progresso or _sem_progresso
+    if perfil is None: perfil = PerfilLote()
+    hoje = hoje or date.today()
+
+    armazem = ArmazemItens(municipios_selecionados)
+    fontes_encontradas = {m: None for m in municipios_selecionados}
+    lista_cnd_global = []
+    header_map_lote = {}
+    cobertura = {}  # município -> CNPJs dos documentos dele neste lote (para o histórico)
+    erros = []
+
+    roteamento = roteamento_padrao() if usar_roteamento else None
+    entradas = normalizar_entradas(arquivos)
+    total_files = len(entradas)
+    arquivos_usados = 0
+
+    with zipfile.ZipFile(zip_destino, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        resultados = extrair_arquivos(entradas, workers=workers, usar_cache=usar_cache, perfil=perfil)
+
+        for idx, (entrada, resultado) in enumerate(zip(entradas, resultados)):
+            nome_file = entrada.nome
+            progresso(0.7 * (idx + 1) / max(total_files, 1), f"Analisando: {nome_file}...")
+
+            # 1. Parse único (CND + itens)
+            cnd, itens, header_map, erro = resultado
+            if erro: erros.append(erro)
+            cnd_info = registro_cnd(nome_file, cnd, hoje)
+            if cnd_info: lista_cnd_global.append(cnd_info)
+
+            # 2. Município: pelos CNPJs do documento e, se eles não decidirem, pelo nome do arquivo
+            with perfil.medir("match_municipio", nome_file):
+                municipio_match = identificar_municipio(nome_file, cnd, itens, header_map,
+                                                        municipios_selecionados, roteamento, erros)
+            if municipio_match:
+                arquivos_usados += 1
+                fontes_encontradas[municipio_match] = nome_file
+
+                armazem.estender(itens, municipio_match)
+                header_map_lote.update(header_map)
+                cobertura.setdefault(municipio_match, set()).update(cnpjs_do_documento(cnd, itens, header_map))
+                # Original copiado sem recompressão (de um ZIP de entrada, com os bytes já comprimidos)
+                with perfil.medir("gravar_zip", nome_file):
+                    try:
+                        entrada.copiar_para(zip_file, f"Relatorios_Originais/{nome_file}")
+                    except _ERROS_LEITURA as e:
+                        erros.append(f"Original de {nome_file} fora do ZIP: {e}")
+
+        if roteamento is not None: roteamento.gravar()
+
+        # Nomes dos órgãos: uma consulta por CNPJ distinto do lote
+        progresso(0.7, "Resolvendo nomes dos órgãos (CNPJ)...")
+        with perfil.medir("resolver_nomes"):
+            armazem.resolver_orgaos(header_map_lote, offline=offline)
+
+        # Histórico: grava esta execução e compara com a anterior de cada município
+        execucao, novidades = None, None
+        if historico is not None:
+            progresso(0.7, "Registrando no histórico...")
+            with perfil.medir("historico"):
+                presentes = [m for m, fonte in fontes_encontradas.items() if fonte]
+                if reaproveitar_execucao is not None and set(presentes) <= historico.municipios(reaproveitar_execucao):
+                    execucao = reaproveitar_execucao
+                else:
+                    execucao = historico.registrar(armazem, presentes, cobertura=cobertura)
+                novidades = historico.novidades(execucao, presentes)
+
+        # Dados para máquina (itens e CNDs), com o mesmo conteúdo dos relatórios
+        formatos = formatos_disponiveis() if formatos_dados is None else formatos_dados
+        if formatos:
+            progresso(0.7, "Exportando dados (JSONL/CSV/Parquet)...")
+            with perfil.medir("exportar_dados"):
+                exportar_dados(zip_file, armazem, lista_cnd_global, formatos)
+
+        # Gera saídas: gerenciais + individuais (em paralelo, gravadas à medida que ficam prontas)
+        progresso(0.7, "Gerando relatórios consolidados...")
+        tarefas = tarefas_relatorios(armazem, fontes_encontradas, lista_cnd_global, logo_bytes, novidades)
+        for k, (caminho, pdf_bytes) in enumerate(renderizar_relatorios(
+                tarefas, workers=workers, perfil=perfil, cache=cache_relatorios_padrao() if usar_cache else None)):
+            # Os relatórios já saem com streams comprimidos (deflate): gravar sem recomprimir
+            with perfil.medir("gravar_zip"):
+                zip_file.writestr(caminho, pdf_bytes, compress_type=zipfile.ZIP_STORED)
+            progresso(0.7 + 0.3 * (k + 1) / len(tarefas), "Gerando relatórios consolidados...")
+
+    perfil.encerrar()
+    progresso(1.0, "Processamento concluído!")
+    return {
+        "armazem": armazem,
+        "fontes_encontradas": fontes_encontradas,
+        "lista_cnd": lista_cnd_global,
+        "arquivos_usados": arquivos_usados,
+        "total_arquivos": total_files,
+        "duplicatas": armazem.duplicatas,
+        "erros": erros,
+        "perfil": perfil,
+        "execucao_historico": execucao,
+    }
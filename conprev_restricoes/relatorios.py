@@ -0,0 +1,380 @@
+"""Geração dos relatórios PDF (individuais e gerenciais)."""
+from datetime import datetime
+
+import fitz  # PyMuPDF
+
+from .utils import _fmt_money, _fmt_centavos
+from .armazem import como_armazem
+from .agregacao import totais
+
+
+def _register_fonts(doc):
+    # No Streamlit Cloud, não temos acesso fácil a fontes do Windows.
+    # Usaremos fontes padrão do PDF (Helvetica)
+    return {"regular": "Helvetica", "bold": "Helvetica-Bold"}
+
+def _draw_header(page, logo_bytes, titulo, info, fonts):
+    W, H = page.rect.width, page.rect.height
+    margin = 36
+    y = margin
+
+    if logo_bytes:
+        try:
+            rect = fitz.Rect(margin, y, margin+130, y+60)
+            page.insert_image(rect, stream=logo_bytes)
+        except: pass
+    
+    text_x = margin + 142
+    page.insert_text((text_x, y+16), titulo, fontname=fonts["bold"], fontsize=16)
+    page.insert_text((text_x, y+36), info, fontname=fonts["regular"], fontsize=10)
+    
+    y_sep = y + 76
+    page.draw_line((margin, y_sep), (W-margin, y_sep), color=(0,0,0), width=0.7)
+    return y_sep + 16, margin
+
+class _Pagina:
+    """Página com o conteúdo acumulado num único Shape: um content stream por página.
+
+    page.insert_text cria e grava um Shape (e um stream novo) a cada linha; aqui as
+    linhas se acumulam e são gravadas de uma vez em commit().
+    """
+
+    def __init__(self, page):
+        self.page = page
+        self.rect = page.rect
+        self._shape = page.new_shape()
+
+    def insert_text(self, ponto, texto, **kwargs):
+        self._shape.insert_text(ponto, texto, **kwargs)
+
+    def draw_line(self, p1, p2, color=(0,0,0), width=1):
+        self._shape.draw_line(p1, p2)
+        self._shape.finish(color=color, width=width)
+
+    def insert_image(self, rect, **kwargs):
+        return self.page.insert_image(rect, **kwargs)
+
+    def commit(self):
+        self._shape.commit()
+
+class _Relatorio:
+    """Documento em construção: logo embutido uma única vez, páginas com um único
+    content stream e gravação comprimida.
+
+    A primeira página insere o logo (decodificação + embutimento); as demais só
+    referenciam o mesmo xref da imagem, em vez de reinserir os bytes a cada página.
+    """
+
+    def __init__(self, logo_bytes, titulo, info, largura, altura):
+        self.doc = fitz.open()
+        self.fonts = _register_fonts(self.doc)
+        self.largura, self.altura = largura, altura
+        self._logo, self._titulo, self._info = logo_bytes, titulo, info
+        self._logo_xref = 0
+        self._pagina = None
+
+    def nova_pagina(self):
+        """Nova página já com o cabeçalho; retorna (page, y, x) do início do conteúdo."""
+        if self._pagina is not None: self._pagina.commit()
+        page = self._pagina = _Pagina(self.doc.new_page(width=self.largura, height=self.altura))
+        margin = 36
+        if self._logo:
+            rect = fitz.Rect(margin, margin, margin+130, margin+60)
+            try:
+                if self._logo_xref: page.insert_image(rect, xref=self._logo_xref)
+                else: self._logo_xref = page.insert_image(rect, stream=self._logo)
+            except: self._logo = None  # logo inválido: segue sem, como em _draw_header
+        y, x = _draw_header(page, None, self._titulo, self._info, self.fonts)
+        return page, y, x
+
+    def tobytes(self):
+        """PDF final: objetos duplicados removidos e streams comprimidos (deflate)."""
+        try:
+            if self._pagina is not None: self._pagina.commit()
+            return self.doc.tobytes(garbage=3, deflate=True)
+        finally:
+            self.doc.close()
+
+def _fmt_valor(d, campo):
+    """Valor do item já em centavos; cai no texto original se não for numérico."""
+    c = d.centavos(campo)
+    return _fmt_centavos(c) if c is not None else _fmt_money(d.get(campo))
+
+def _resumo_totais(rel, page, y, x, armazem, linhas, campos, descrever, somar=None):
+    """Bloco final com os totais por UF e o total geral das linhas informadas.
+
+    somar(por) substitui o totais() padrão quando o valor somado varia por linha.
+    """
+    fonts = rel.fonts
+    line_h = 16
+    somar = somar or (lambda por: totais(armazem, por=por, campos=campos, linhas=linhas))
+    por_uf = somar(("uf",))
+    geral = somar(()).get(())
+    if not geral: return page, y
+    if y > 550 - line_h * (len(por_uf) + 3):
+        page, y, x = rel.nova_pagina()
+    page.draw_line((x, y - 10), (x + 770, y - 10), color=(0, 0, 0), width=0.5)
+    page.insert_text((x, y + 4), "TOTAIS POR UF", fontname=fonts["bold"], fontsize=12); y += line_h * 1.5
+    for (uf,), t in por_uf.items():
+        page.insert_text((x+10, y), f"{uf or 'UF não identificada'}: {descrever(t)}", fontname=fonts["regular"], fontsize=10)
+        y += line_h
+    y += line_h * 0.5
+    page.insert_text((x, y), f"TOTAL GERAL: {descrever(geral)}", fontname=fonts["bold"], fontsize=11)
+    return page, y + line_h
+
+def gerar_pdf_individual(itens, municipio, src_name, logo_bytes):
+    A4 = fitz.paper_rect("a4")
+    titulo = f"RELATÓRIO DE RESTRIÇÕES · {municipio}"
+    # Só a data: o PDF pode vir do cache de relatórios (válido no dia, ver cache.CacheRelatorios)
+    info = f"Gerado em {datetime.now().strftime('%d/%m/%Y')} · Fonte: RFB/PGFN"
+    
+    rel = _Relatorio(logo_bytes, titulo, info, A4.height, A4.width) # Paisagem se quiser, ou A4 normal
+    fonts = rel.fonts
+    page, y, x = rel.nova_pagina()
+    
+    # Renderização simplificada dos itens
+    line_h = 14
+
+    for item in itens:
+        tipo = item.get("tipo", "")
+        texto = f"[{tipo}] "
+        if tipo == "DEVEDOR":
+            texto += f"{item.get('cod')} - {item.get('nome')} | Venc: {item.get('venc')} | R$ {item.get('dev')}"
+        elif tipo == "MAED":
+            texto += f"{item.get('cod')} - {item.get('desc')} | Comp: {item.get('comp')} | R$ {item.get('dev')}"
+        elif tipo == "OMISSÃO":
+            texto += f"Período: {item.get('periodo')}"
+        else:
+            texto += str(item.get("raw", ""))[:100]
+            
+        if y > A4.width - 40: page, y, x = rel.nova_pagina()
+        page.insert_text((x, y), texto, fontname=fonts["regular"], fontsize=10)
+        y += line_h
+
+    return rel.tobytes()
+
+# Saldo de um item da categoria MAED: 'dev' do MAED e 'cons' do DEVEDOR disfarçado
+_CAMPO_SALDO_MAED = {"MAED": "dev", "DEVEDOR": "cons"}
+
+def _totais_saldo_maed(armazem, por=("municipio",)):
+    """Como totais(), somando o saldo de cada item da categoria MAED sob a chave "saldo"."""
+    resultado = {}
+    for tipo, campo in _CAMPO_SALDO_MAED.items():
+        linhas = armazem.indices(tipo=tipo, categoria="MAED")
+        for chave, t in totais(armazem, por=por, campos=(campo,), linhas=linhas).items():
+            soma = resultado.setdefault(chave, {"n": 0, "saldo": 0})
+            soma["n"] += t["n"]; soma["saldo"] += t[campo]
+    return resultado
+
+def gerar_pdf_gerencial_maed(dados_municipios, logo_bytes):
+    titulo = "RELATÓRIO GERENCIAL · MAED"
+    info = f"Gerado em {datetime.now().strftime('%d/%m/%Y')}"
+    rel = _Relatorio(logo_bytes, titulo, info, 842, 595) # A4 Landscape
+    fonts = rel.fonts
+    page, y, x = rel.nova_pagina()
+    
+    line_h = 16
+    armazem = como_armazem(dados_municipios)
+    # Categoria MAED: os MAED e os DEVEDOR que são MAED disfarçado (ver armazem.categoria_item)
+    linhas_maed = armazem.indices(categoria="MAED")
+    subtotais = _totais_saldo_maed(armazem)
+
+    def descrever(t):
+        return f"{t['n']} MAED(s) | Saldo: R$ {_fmt_centavos(t['saldo'])}"
+
+    has_content = False
+    for mun, maeds in armazem.por_municipio(categoria="MAED"):
+        has_content = True
+        
+        if y > 550: 
+            page, y, x = rel.nova_pagina()
+            
+        page.insert_text((x, y), mun, fontname=fonts["bold"], fontsize=12); y += line_h * 1.5
+        
+        for d in maeds:
+            if y > 550:
+                page, y, x = rel.nova_pagina()
+            
+            saldo = _fmt_valor(d, _CAMPO_SALDO_MAED.get(d.get("tipo"), "dev"))
+            line = f"• {d.get('cod')} - {d.get('desc') or d.get('nome')} | Comp: {d.get('comp')} | Venc: {d.get('venc')} | Saldo: R$ {saldo}"
+            page.insert_text((x+10, y), line, fontname=fonts["regular"], fontsize=10)
+            y += line_h
+        page.insert_text((x+10, y), f"Subtotal {mun}: {descrever(subtotais[(mun,)])}", fontname=fonts["bold"], fontsize=10)
+        y += line_h * 2
+
+    if not has_content:
+        page.insert_text((x, y), "Nenhum MAED encontrado nos arquivos selecionados.", fontname=fonts["regular"], fontsize=12)
+    else:
+        page, y = _resumo_totais(rel, page, y, x, armazem, linhas_maed, ("saldo",), descrever,
+                                 somar=lambda por: _totais_saldo_maed(armazem, por))
+
+    return rel.tobytes()
+
+def gerar_pdf_gerencial_devedor(dados_municipios, logo_bytes):
+    titulo = "RELATÓRIO GERENCIAL · DEVEDORES"
+    info = f"Gerado em {datetime.now().strftime('%d/%m/%Y')}"
+    rel = _Relatorio(logo_bytes, titulo, info, 842, 595)
+    fonts = rel.fonts
+    page, y, x = rel.nova_pagina()
+    line_h = 16
+    armazem = como_armazem(dados_municipios)
+
+    # MAED disfarçado de DEVEDOR já vem com categoria "MAED" da extração
+    grupos = armazem.por_municipio(categoria="DEVEDOR")
+    linhas_dev = armazem.indices(categoria="DEVEDOR")
+    subtotais = totais(armazem, campos=("orig", "cons"), linhas=linhas_dev)
+
+    def descrever(t):
+        return f"{t['n']} débito(s) | Original: R$ {_fmt_centavos(t['orig'])} | Consolidado: R$ {_fmt_centavos(t['cons'])}"
+
+    has_content = False
+    for mun, clean_devs in grupos:
+        has_content = True
+
+        if y > 550: 
+            page, y, x = rel.nova_pagina()
+            
+        page.insert_text((x, y), mun, fontname=fonts["bold"], fontsize=12); y += line_h * 1.5
+        
+        for d in clean_devs:
+            if y > 530: # Item ocupa 2 linhas
+                page, y, x = rel.nova_pagina()
+                
+            l1 = f"• {d.get('cod')} - {d.get('nome')} ({d.get('comp')})"
+            l2 = f"  Original: R$ {_fmt_valor(d, 'orig')} | Consolidado: R$ {_fmt_valor(d, 'cons')}"
+            
+            page.insert_text((x+10, y), l1, fontname=fonts["regular"], fontsize=10); y += line_h
+            page.insert_text((x+10, y), l2, fontname=fonts["regular"], fontsize=10, color=(0.4, 0.4, 0.4)); y += line_h
+        page.insert_text((x+10, y), f"Subtotal {mun}: {descrever(subtotais[(mun,)])}", fontname=fonts["bold"], fontsize=10)
+        y += line_h * 2
+
+    if not has_content: page.insert_text((x, y), "Nenhum DEVEDOR encontrado.", fontname=fonts["regular"], fontsize=12)
+    else:
+        page, y = _resumo_totais(rel, page, y, x, armazem, linhas_dev, ("orig", "cons"), descrever)
+    
+    return rel.tobytes()
+
+_CORES_NOVIDADE = {"NOVO": (0.8, 0.0, 0.0), "RESOLVIDO": (0.0, 0.5, 0.0), "ALTERADO": (0.9, 0.5, 0.0)}
+
+def gerar_pdf_novidades(mudancas, sem_base, logo_bytes):
+    """Itens novos, resolvidos e alterados desde a execução anterior (ver historico.novidades)."""
+    titulo = "RELATÓRIO GERENCIAL · NOVIDADES"
+    info = f"Gerado em {datetime.now().strftime('%d/%m/%Y')} · Comparação com a execução anterior de cada município e CNPJ"
+    rel = _Relatorio(logo_bytes, titulo, info, 842, 595)
+    fonts = rel.fonts
+    page, y, x = rel.nova_pagina()
+    line_h = 16
+
+    grupos = {}
+    for m in mudancas: grupos.setdefault(m["municipio"], []).append(m)
+
+    for mun, itens in grupos.items():
+        if y > 550:
+            page, y, x = rel.nova_pagina()
+        page.insert_text((x, y), mun, fontname=fonts["bold"], fontsize=12); y += line_h * 1.5
+
+        contagem = {"NOVO": 0, "RESOLVIDO": 0, "ALTERADO": 0}
+        for d in itens:
+            if y > 550:
+                page, y, x = rel.nova_pagina()
+            situacao = d["situacao"]
+            contagem[situacao] += 1
+            rotulo = f"[{situacao}] "
+            page.insert_text((x+10, y), rotulo, fontname=fonts["bold"], fontsize=10, color=_CORES_NOVIDADE[situacao])
+            len_rot = fitz.get_text_length(rotulo, fontname=fonts["bold"], fontsize=10)
+
+            line = f"{d['tipo']} · " + " - ".join(t for t in (d["cod"], d["descricao"]) if t)
+            if d["comp"]: line += f" ({d['comp']})"
+            if situacao == "ALTERADO":
+                line += f" | R$ {_fmt_centavos(d['valor_anterior'])} -> R$ {_fmt_centavos(d['valor_atual'])}"
+            elif situacao == "NOVO" and d["valor_atual"] is not None:
+                line += f" | R$ {_fmt_centavos(d['valor_atual'])}"
+            elif situacao == "RESOLVIDO" and d["valor_anterior"] is not None:
+                line += f" | R$ {_fmt_centavos(d['valor_anterior'])}"
+            page.insert_text((x+10+len_rot, y), line, fontname=fonts["regular"], fontsize=10)
+            y += line_h
+        resumo = " | ".join(f"{k.capitalize()}s: {v}" for k, v in contagem.items())
+        page.insert_text((x+10, y), f"Subtotal {mun}: {resumo}", fontname=fonts["bold"], fontsize=10)
+        y += line_h * 2
+
+    if not grupos:
+        page.insert_text((x, y), "Nenhuma mudança desde a execução anterior.", fontname=fonts["regular"], fontsize=12)
+        y += line_h * 2
+
+    if sem_base:
+        if y > 530:
+            page, y, x = rel.nova_pagina()
+        page.insert_text((x, y), "Sem execução anterior para comparar (primeiro registro no histórico):",
+                         fontname=fonts["bold"], fontsize=10)
+        y += line_h
+        for mun in sem_base:
+            if y > 550:
+                page, y, x = rel.nova_pagina()
+            page.insert_text((x+10, y), f"• {mun}", fontname=fonts["regular"], fontsize=10)
+            y += line_h
+
+    return rel.tobytes()
+
+def gerar_pdf_validade_cnd(lista_cnd, logo_bytes):
+    """Gera PDF com lista de CNDs e status colorido (Vencida/A Vencer)."""
+    titulo = "RELATÓRIO GERENCIAL · VALIDADE CND"
+    info = f"Gerado em {datetime.now().strftime('%d/%m/%Y')} · Fonte: RFB/PGFN"
+    # A4 Retrato é melhor para listas simples
+    rel = _Relatorio(logo_bytes, titulo, info, 595, 842)
+    fonts = rel.fonts
+    page, y, x = rel.nova_pagina()
+    line_h = 14
+    gap = 24
+    
+    # Ordena: Vencidas primeiro, depois as mais próximas de vencer
+    # (dias ascending: negativos [vencidos] -> pequenos [urgentes] -> grandes [ok])
+    lista_cnd.sort(key=lambda k: (k['dias'] is None, k['dias']))
+
+    if not lista_cnd:
+        page.insert_text((x, y), "Nenhuma informação de validade encontrada.", fontname=fonts["regular"], fontsize=12)
+        return rel.tobytes()
+
+    for item in lista_cnd:
+        # Pula página se necessário
+        if y > 750:
+            page, y, x = rel.nova_pagina()
+        
+        # Lógica de Cores
+        dias = item['dias']
+        color = (0,0,0) # Preto padrão
+        msg_dias = "Data inválida"
+
+        if dias is not None:
+            if dias < 0:
+                color = (0.8, 0.0, 0.0) # Vermelho (Vencida)
+                msg_dias = f"VENCIDA há {abs(dias)} dias"
+            elif dias == 0:
+                color = (0.8, 0.0, 0.0) # Vermelho (Vence hoje)
+                msg_dias = "VENCE HOJE"
+            elif dias <= 30:
+                color = (0.9, 0.5, 0.0) # Laranja (Urgente)
+                msg_dias = f"Vence em {dias} dias"
+            elif dias <= 90:
+                color = (0.8, 0.7, 0.0) # Amarelo (Atenção)
+                msg_dias = f"Vence em {dias} dias"
+            else:
+                color = (0.0, 0.5, 0.0) # Verde (OK)
+                msg_dias = f"Vence em {dias} dias"
+
+        # Linha 1: Nome e CNPJ
+        nome_display = item['nome'] or "Não identificado"
+        cnpj_display = f"(CNPJ: {item['cnpj']})" if item['cnpj'] else ""
+        page.insert_text((x, y), f"• {nome_display} {cnpj_display}", fontname=fonts["bold"], fontsize=10)
+        y += line_h
+        
+        # Linha 2: Validade e Status Colorido
+        lbl_val = f"  Validade: {item['validade']}  |  Situação: "
+        page.insert_text((x, y), lbl_val, fontname=fonts["regular"], fontsize=10)
+        
+        # Calcula onde desenhar o texto colorido logo após o rótulo
+        len_lbl = fitz.get_text_length(lbl_val, fontname=fonts["regular"], fontsize=10)
+        page.insert_text((x + len_lbl, y), msg_dias, fontname=fonts["bold"], fontsize=10, color=color)
+        
+        y += gap
+
+    return rel.tobytes()
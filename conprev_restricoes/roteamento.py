@@ -0,0 +1,105 @@
+"""Roteamento de arquivos para municípios pelos CNPJs lidos no documento.
+
+O índice CNPJ -> município (prefeitura, câmara, RPPS...) é aprendido dos arquivos já
+atribuídos a um município e persistido em SQLite. Com ele, o município de um PDF sai
+de uma consulta direta pelos CNPJs do conteúdo, e o casamento pelo nome do arquivo
+fica só como alternativa para documentos com CNPJs ainda desconhecidos.
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+from .cnpj import _CNPJ_CACHE_DIR, _cnpj_digits
+
+_ROTEAMENTO_DB = os.path.join(_CNPJ_CACHE_DIR, "roteamento.sqlite3")
+
+def cnpjs_do_documento(cnd, itens, header_map):
+    """CNPJs (14 dígitos) de um resultado de extração: certidão, cabeçalhos e itens."""
+    cnpjs = {_cnpj_digits(cnd[0])} if cnd and cnd[0] else set()
+    cnpjs.update(header_map or ())
+    cnpjs.update(_cnpj_digits(it.get("cnpj")) for it in itens if it.get("cnpj"))
+    return {d for d in cnpjs if len(d) == 14}
+
+class RoteamentoCNPJ:
+    """Índice CNPJ -> municípios, carregado do disco uma vez e consultado em memória.
+
+    Um CNPJ visto em documentos de mais de um município não decide nada sozinho.
+    """
+
+    def __init__(self, caminho=None):
+        self.caminho = caminho or _ROTEAMENTO_DB
+        self._mapa = None      # dígitos -> set(municípios)
+        self._pendentes = set()  # (cnpj, município) aprendidos e ainda não gravados
+        self._lock = threading.Lock()
+
+    def _conn(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.caminho)), exist_ok=True)
+        conn = sqlite3.connect(self.caminho, timeout=10)
+        conn.execute("CREATE TABLE IF NOT EXISTS cnpj_municipio (cnpj TEXT NOT NULL, municipio TEXT NOT NULL, "
+                     "ts REAL NOT NULL, PRIMARY KEY (cnpj, municipio)) WITHOUT ROWID")
+        return conn
+
+    def _carregar(self):
+        if self._mapa is not None: return self._mapa
+        mapa = {}
+        try:
+            conn = self._conn()
+            try:
+                for cnpj, mun in conn.execute("SELECT cnpj, municipio FROM cnpj_municipio"):
+                    mapa.setdefault(cnpj, set()).add(mun)
+            finally:
+                conn.close()
+        except sqlite3.Error: pass
+        self._mapa = mapa
+        return mapa
+
+    def municipio(self, cnpjs):
+        """Município indicado pelos CNPJs, ou None se nenhum é conhecido ou há empate.
+
+        Cada CNPJ atribuído a um único município conta um voto para ele.
+        """
+        with self._lock:
+            mapa = self._carregar()
+            votos = Counter(next(iter(m)) for m in (mapa.get(d) for d in cnpjs) if m and len(m) == 1)
+        if not votos: return None
+        (primeiro, n), *resto = votos.most_common(2)
+        if resto and resto[0][1] == n: return None
+        return primeiro
+
+    def aprender(self, cnpjs, municipio):
+        """Associa os CNPJs ao município (em memória; persistido em gravar())."""
+        with self._lock:
+            mapa = self._carregar()
+            for d in cnpjs:
+                atuais = mapa.setdefault(d, set())
+                if municipio not in atuais:
+                    atuais.add(municipio)
+                    self._pendentes.add((d, municipio))
+
+    def gravar(self):
+        """Persiste as associações aprendidas desde a última gravação."""
+        with self._lock:
+            pendentes, self._pendentes = self._pendentes, set()
+        if not pendentes: return
+        agora = time.time()
+        try:
+            conn = self._conn()
+            try:
+                with conn:
+                    conn.executemany("INSERT OR REPLACE INTO cnpj_municipio (cnpj, municipio, ts) VALUES (?, ?, ?)",
+                                     [(d, m, agora) for d, m in sorted(pendentes)])
+            finally:
+                conn.close()
+        except sqlite3.Error: pass
+
+_ROTEAMENTO = None
+_ROTEAMENTO_LOCK = threading.Lock()
+
+def roteamento_padrao():
+    """Índice compartilhado pelo processo, no diretório de cache."""
+    global _ROTEAMENTO
+    with _ROTEAMENTO_LOCK:
+        if _ROTEAMENTO is None: _ROTEAMENTO = RoteamentoCNPJ()
+        return _ROTEAMENTO
@@ -0,0 +1,57 @@
+"""Funções utilitárias de formatação (CNPJ, valores, datas)."""
+import re
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+_RE_VALOR_LIXO = re.compile(r"[^\d,.\-]")
+
+
+def _mask_cnpj_digits(s: str) -> str:
+    d = re.sub(r"\D", "", str(s or ""))[:14]
+    if len(d) != 14: return s or ""
+    return f"{d[:2]}.{d[2:5]}.{d[5:8]}/{d[8:12]}-{d[12:14]}"
+
+def _fmt_money(v) -> str:
+    if v is None: return "0,00"
+    s = str(v).strip()
+    if not s: return "0,00"
+    if "," in s and any(ch.isdigit() for ch in s): return s
+    try:
+        num = float(s.replace(".", "").replace(",", "."))
+        s = f"{num:,.2f}"
+        s = s.replace(",", "X").replace(".", ",").replace("X", ".")
+        return s
+    except: return s
+
+def valor_centavos(v):
+    """Converte um valor no formato brasileiro ("1.234,56") em centavos; None se não for número.
+
+    Sem vírgula, pontos são tratados como separador de milhar (mesma leitura de _fmt_money).
+    """
+    if v is None: return None
+    s = _RE_VALOR_LIXO.sub("", str(v))
+    if not s or not any(ch.isdigit() for ch in s): return None
+    try:
+        return int((Decimal(s.replace(".", "").replace(",", ".")) * 100).to_integral_value())
+    except InvalidOperation:
+        return None
+
+def _fmt_centavos(c) -> str:
+    """Formata centavos (int) como valor brasileiro: 123456 -> "1.234,56"."""
+    if c is None: return "0,00"
+    s = f"{abs(c) // 100:,}".replace(",", ".") + f",{abs(c) % 100:02d}"
+    return "-" + s if c < 0 else s
+
+def _parse_date_br_to_date(s: str):
+    if not s: return None
+    m = re.search(r"(\d{2})/(\d{2})/(\d{4})", str(s))
+    if not m: return None
+    try: return date(int(m.group(3)), int(m.group(2)), int(m.group(1)))
+    except: return None
+
+def _cnd_days_color_tuple(days: int):
+    if days is None: return (0, 0, 0)
+    if days > 90: return (0.05, 0.55, 0.15)
+    if days > 30: return (0.95, 0.75, 0.08)
+    if days > 0: return (1.00, 0.45, 0.00)
+    return (0.90, 0.12, 0.12)
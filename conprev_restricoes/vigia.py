@@ -0,0 +1,187 @@
+"""Modo contínuo: vigia uma pasta e mantém o ZIP de saída sempre atualizado.
+
+A cada varredura, os PDFs (e ZIPs de PDFs) novos ou alterados entram no lote só depois
+de ficarem estáveis (mesmo tamanho e mtime por 'espera' segundos), para não ler um
+arquivo ainda sendo copiado. Cada arquivo passa uma única vez pela extração (com o
+cache de resultados) e pela identificação do município; arquivos removidos saem do
+resultado. Só os relatórios individuais dos municípios afetados e os gerenciais são
+renderizados de novo; os demais PDFs são reaproveitados da rodada anterior e o ZIP é
+regravado por inteiro (troca atômica), com os originais e os Dados/.
+"""
+import os
+import time
+import zipfile
+import logging
+from datetime import date
+
+from .armazem import ArmazemItens
+from .entrada import normalizar_entradas, _ERROS_LEITURA
+from .exportacao import exportar_dados
+from .paralelo import extrair_arquivos, tarefas_relatorios, renderizar_relatorios, caminho_individual
+from .pipeline import registro_cnd, identificar_municipio
+from .roteamento import roteamento_padrao
+
+logger = logging.getLogger(__name__)
+
+_INTERVALO = 5.0  # s entre varreduras
+_ESPERA = 2.0     # s sem mudança para um arquivo ser considerado completo
+
+class VigiaPasta:
+    """Mantém zip_destino atualizado com os PDFs que aparecem (ou mudam) em 'diretorio'."""
+
+    def __init__(self, diretorio, zip_destino, municipios, logo_bytes=None, workers=1, offline=None,
+                 intervalo=_INTERVALO, espera=_ESPERA, usar_roteamento=True, formatos_dados=None):
+        self.diretorio = diretorio
+        self.zip_destino = zip_destino
+        self.municipios = list(municipios)
+        self.logo_bytes = logo_bytes
+        self.workers = workers
+        self.offline = offline
+        self.intervalo = intervalo
+        self.espera = espera
+        self.formatos_dados = formatos_dados
+        self.roteamento = roteamento_padrao() if usar_roteamento else None
+        self._candidatos = {}   # caminho -> ((mtime_ns, tamanho), visto desde)
+        self._processados = {}  # caminho -> (mtime_ns, tamanho) da versão processada
+        self._arquivos = {}     # caminho -> [(entrada, cnd, itens, header_map, municipio)]
+        self._erros = {}        # caminho -> [mensagens]
+        self._pdfs = {}         # caminho no ZIP -> bytes do relatório já renderizado
+        self._dia = None
+        # O próprio ZIP de saída (e o temporário da troca) nunca é entrada
+        destino = os.path.realpath(zip_destino)
+        self._saidas = {destino, destino + ".tmp"}
+
+    def _varrer(self):
+        """{caminho: (mtime_ns, tamanho)} dos PDFs e ZIPs da pasta (não recursivo)."""
+        atuais = {}
+        with os.scandir(self.diretorio) as it:
+            for e in it:
+                if not e.name.lower().endswith((".pdf", ".zip")): continue
+                if os.path.realpath(e.path) in self._saidas: continue
+                try:
+                    if not e.is_file(): continue
+                    st = e.stat()
+                except OSError:
+                    continue
+                atuais[e.path] = (st.st_mtime_ns, st.st_size)
+        return atuais
+
+    def _prontos(self, atuais, agora):
+        """Caminhos novos ou alterados que não mudam há pelo menos 'espera' segundos."""
+        prontos = []
+        for caminho, assinatura in atuais.items():
+            if self._processados.get(caminho) == assinatura: continue
+            anterior = self._candidatos.get(caminho)
+            if anterior is None or anterior[0] != assinatura:
+                self._candidatos[caminho] = (assinatura, agora)
+            elif agora - anterior[1] >= self.espera:
+                prontos.append(caminho)
+        for caminho in list(self._candidatos):
+            if caminho not in atuais: del self._candidatos[caminho]
+        return sorted(prontos)
+
+    def _ingerir(self, caminhos):
+        """Extrai de uma vez (um único pool) os arquivos prontos: {caminho: (registros, erros)}."""
+        resultado, entradas, origem = {}, [], []
+        for caminho in caminhos:
+            try:
+                novas = normalizar_entradas([caminho])
+            except Exception as e:
+                # Ex.: ZIP ainda incompleto ou corrompido; volta a ser lido se mudar
+                resultado[caminho] = [], [f"Erro ao ler {os.path.basename(caminho)}: {e}"]
+                continue
+            resultado[caminho] = [], []
+            entradas.extend(novas)
+            origem.extend([caminho] * len(novas))
+        for caminho, entrada, (cnd, itens, header_map, erro) in zip(
+                origem, entradas, extrair_arquivos(entradas, workers=self.workers)):
+            registros, erros = resultado[caminho]
+            if erro: erros.append(erro)
+            mun = identificar_municipio(entrada.nome, cnd, itens, header_map, self.municipios, self.roteamento, erros)
+            registros.append((entrada, cnd, itens, header_map, mun))
+        return resultado
+
+    def ciclo(self, agora=None):
+        """Uma varredura. Retorna o conjunto de municípios afetados ou None se nada mudou."""
+        agora = time.monotonic() if agora is None else agora
+        atuais = self._varrer()
+        prontos = self._prontos(atuais, agora)
+        removidos = [c for c in self._processados if c not in atuais]
+        hoje = date.today()
+        if not prontos and not removidos and hoje == self._dia: return None
+
+        afetados = set()
+        for caminho in removidos:
+            afetados.update(r[4] for r in self._arquivos.pop(caminho, ()))
+            self._processados.pop(caminho, None); self._erros.pop(caminho, None)
+        for caminho, (registros, erros) in self._ingerir(prontos).items():
+            afetados.update(r[4] for r in self._arquivos.get(caminho, ()))
+            self._arquivos[caminho] = registros
+            self._erros[caminho] = erros
+            self._processados[caminho] = atuais[caminho]
+            self._candidatos.pop(caminho, None)
+            afetados.update(r[4] for r in registros)
+        afetados.discard(None)
+        if self.roteamento is not None: self.roteamento.gravar()
+
+        self._atualizar_zip(afetados, hoje)
+        self._dia = hoje
+        return afetados
+
+    def _atualizar_zip(self, afetados, hoje):
+        # Estado completo, na ordem dos nomes de arquivo (mesma ordem de um lote)
+        armazem = ArmazemItens(self.municipios)
+        fontes = {m: None for m in self.municipios}
+        lista_cnd, header_map_total, originais = [], {}, []
+        for caminho in sorted(self._arquivos):
+            for entrada, cnd, itens, header_map, mun in self._arquivos[caminho]:
+                cnd_info = registro_cnd(entrada.nome, cnd, hoje)
+                if cnd_info: lista_cnd.append(cnd_info)
+                if not mun: continue
+                fontes[mun] = entrada.nome
+                armazem.estender(itens, mun)
+                header_map_total.update(header_map)
+                originais.append(entrada)
+        armazem.resolver_orgaos(header_map_total, offline=self.offline)
+
+        # Renderiza só os gerenciais e os individuais dos municípios afetados
+        com_itens = {m for m in armazem.agrupar("municipio") if m is not None}
+        individuais = {caminho_individual(m) for m in com_itens}
+        refazer = {caminho_individual(m) for m in afetados} | {c for c in individuais if c not in self._pdfs}
+        tarefas = [t for t in tarefas_relatorios(armazem, fontes, lista_cnd, self.logo_bytes)
+                   if not t[0].startswith("Relatorios_Individuais/") or t[0] in refazer]
+        for caminho in [c for c in self._pdfs if c.startswith("Relatorios_Individuais/") and c not in individuais]:
+            del self._pdfs[caminho]
+        for caminho, pdf_bytes in renderizar_relatorios(tarefas, workers=self.workers):
+            self._pdfs[caminho] = pdf_bytes
+
+        tmp = self.zip_destino + ".tmp"
+        with zipfile.ZipFile(tmp, "w", zipfile.ZIP_DEFLATED) as zip_file:
+            for entrada in originais:
+                try:
+                    entrada.copiar_para(zip_file, f"Relatorios_Originais/{entrada.nome}")
+                except _ERROS_LEITURA:
+                    pass  # removido depois da varredura ou membro ilegível (o erro já saiu na extração)
+            if self.formatos_dados is None or self.formatos_dados:
+                exportar_dados(zip_file, armazem, lista_cnd, self.formatos_dados)
+            for caminho in sorted(self._pdfs):
+                zip_file.writestr(caminho, self._pdfs[caminho], compress_type=zipfile.ZIP_STORED)
+        os.replace(tmp, self.zip_destino)
+
+    def erros(self):
+        """Mensagens de erro dos arquivos atualmente na pasta."""
+        return [e for caminho in sorted(self._erros) for e in self._erros[caminho]]
+
+    def executar(self, ao_atualizar=None, parar=None):
+        """Varre a pasta a cada 'intervalo' segundos até parar() retornar True (ou Ctrl+C).
+
+        ao_atualizar(afetados) é chamado depois de cada regravação do ZIP.
+        """
+        while not (parar and parar()):
+            try:
+                afetados = self.ciclo()
+            except Exception:
+                logger.exception("Falha na varredura de %s", self.diretorio)
+                afetados = None
+            if afetados is not None and ao_atualizar: ao_atualizar(afetados)
+            time.sleep(self.intervalo)
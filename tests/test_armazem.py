@@ -0,0 +1,40 @@
+"""Unificação de itens repetidos entre arquivos do mesmo município (armazem.ArmazemItens)."""
+import pickle
+
+from conprev_restricoes import armazem as modulo
+from conprev_restricoes.armazem import ArmazemItens
+
+def _item(src, cod="1082-01", cons="10,00", cnpj="01.234.567/0001-89"):
+    return {"tipo": "DEVEDOR", "cod": cod, "nome": "CP SEGURADOS", "comp": "01/2023", "venc": "20/01/2023",
+            "cons": cons, "cnpj": cnpj, "src": src}
+
+def test_repeticao_no_mesmo_arquivo_nao_e_unificada():
+    a = ArmazemItens(["Trindade"])
+    a.estender([_item("r.pdf"), _item("r.pdf")], "Trindade")
+    assert len(a) == 2 and a.duplicatas == 0
+    assert [r.fontes for r in a] == [["r.pdf"], ["r.pdf"]]
+
+def test_mesmo_item_de_dois_arquivos_e_unificado():
+    a = ArmazemItens(["Trindade", "Goiatuba"])
+    a.estender([_item("prefeitura.pdf"), _item("prefeitura.pdf"), _item("prefeitura.pdf", cons="11,00")], "Trindade")
+    a.estender([_item("camara.pdf"), _item("camara.pdf"), _item("camara.pdf")], "Trindade")
+    a.estender([_item("goiatuba.pdf")], "Goiatuba")  # outro município: nunca unifica
+    assert len(a) == 5 and a.duplicatas == 2
+    assert [r.fontes for r in a] == [["prefeitura.pdf", "camara.pdf"], ["prefeitura.pdf", "camara.pdf"],
+                                     ["prefeitura.pdf"], ["camara.pdf"], ["goiatuba.pdf"]]
+    assert a.registro(0).to_dict()["fontes"] == ["prefeitura.pdf", "camara.pdf"]
+
+def test_colisao_de_hash_nao_unifica(monkeypatch):
+    monkeypatch.setattr(modulo, "hash", lambda _: 0, raising=False)  # toda identidade no mesmo balde
+    a = ArmazemItens(["Trindade"])
+    a.estender([_item("a.pdf"), _item("a.pdf", cod="5440"), _item("a.pdf", cnpj="11.111.111/0001-11")], "Trindade")
+    a.estender([_item("b.pdf", cod="5440"), _item("b.pdf", cons="1,00")], "Trindade")
+    assert len(a) == 4 and a.duplicatas == 1
+    assert [r.get("cod") for r in a if len(r.fontes) > 1] == ["5440"]
+
+def test_indice_refeito_depois_de_pickle_e_filtro():
+    a = ArmazemItens(["Trindade"])
+    a.estender([_item("a.pdf")], "Trindade")
+    for b in (pickle.loads(pickle.dumps(a)), a.filtrar("Trindade")):
+        b.adicionar(_item("b.pdf"), "Trindade")
+        assert len(b) == 1 and b.registro(0).fontes == ["a.pdf", "b.pdf"]
@@ -0,0 +1,35 @@
+"""Cache de nomes por CNPJ: só 'não encontrado' vira cache negativo."""
+import pytest
+
+from conprev_restricoes import cnpj
+
+A, B, C = "11111111000111", "22222222000122", "33333333000133"
+
+@pytest.fixture
+def cache_vazio(tmp_path, monkeypatch):
+    monkeypatch.setattr(cnpj, "_CNPJ_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(cnpj, "_CNPJ_CACHE_DB", str(tmp_path / "cnpj_nomes.sqlite3"))
+    monkeypatch.setattr(cnpj, "_CNPJ_LOOKUP_CACHE", {})
+    monkeypatch.setattr(cnpj, "_CNPJ_FALHAS", {})
+
+def test_falha_temporaria_nao_vira_cache_negativo(cache_vazio, monkeypatch):
+    respostas = {A: "PREFEITURA A", B: "", C: None}  # C: 429/timeout
+    consultas = []
+    def fetch(d):
+        consultas.append(d)
+        return respostas[d]
+    monkeypatch.setattr(cnpj, "_cnpj_fetch_brasilapi", fetch)
+
+    assert cnpj._resolver_cnpjs([A, B, C], offline=False) == {A: "PREFEITURA A", B: ""}
+    assert cnpj._cnpj_cache_get({A, B, C}) == {A: "PREFEITURA A", B: ""}
+
+    # Dentro do intervalo da falha, C não é consultado de novo
+    consultas.clear()
+    cnpj._resolver_cnpjs([A, B, C], offline=False)
+    assert consultas == []
+
+    # Passado o intervalo, C é consultado e, se responder, entra no cache
+    cnpj._CNPJ_FALHAS[C] -= cnpj._CNPJ_TTL_FALHA
+    respostas[C] = "CAMARA C"
+    assert cnpj._resolver_cnpjs([C], offline=False) == {C: "CAMARA C"}
+    assert consultas == [C]
@@ -0,0 +1,80 @@
+"""Cópia dos PDFs de ZIPs de entrada para o ZIP de saída (entrada.MembroZip)."""
+import io
+import zipfile
+
+from conprev_restricoes import entrada
+from conprev_restricoes.entrada import entradas_de
+from conprev_restricoes.paralelo import extrair_arquivos
+from conprev_restricoes.pipeline import processar_lote
+
+PDF = b"%PDF-1.4\n" + b"conteudo de teste " * 2000 + b"\n%%EOF\n"
+
+def _zip_entrada():
+    """ZIP com um membro deflate de nome ASCII e dois com nomes legados (sem a flag UTF-8):
+    um em cp437 e outro em UTF-8, como os compactadores do Windows gravam."""
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr("pasta/Goiatuba.pdf", PDF)
+        z.writestr("Relat_rio.pdf", PDF)
+        z.writestr("Relat__rio.pdf", PDF)
+    bruto = buf.getvalue()
+    # Troca os nomes provisórios (no cabeçalho local e no diretório central) pelos bytes legados
+    bruto = bruto.replace(b"Relat_rio.pdf", "Relatório.pdf".encode("cp437"))
+    bruto = bruto.replace(b"Relat__rio.pdf", "Relatório.pdf".encode("utf-8"))
+    return bruto
+
+def _copiar(entradas):
+    saida = io.BytesIO()
+    with zipfile.ZipFile(saida, "w", zipfile.ZIP_DEFLATED) as z:
+        for k, e in enumerate(entradas):
+            e.copiar_para(z, f"Relatorios_Originais/{k}_{e.nome}")
+    return zipfile.ZipFile(io.BytesIO(saida.getvalue()))
+
+def test_nomes_dos_membros():
+    nomes = [e.nome for e in entradas_de("lote.zip", _zip_entrada())]
+    assert nomes == ["pasta_Goiatuba.pdf", "Relatório.pdf", "Relatório.pdf"]
+
+def test_copia_bruta_preserva_compressao_e_conteudo():
+    z = _copiar(entradas_de("lote.zip", _zip_entrada()))
+    assert z.testzip() is None
+    assert z.namelist() == ["Relatorios_Originais/0_pasta_Goiatuba.pdf",
+                            "Relatorios_Originais/1_Relatório.pdf",
+                            "Relatorios_Originais/2_Relatório.pdf"]
+    for info in z.infolist():
+        assert info.compress_type == zipfile.ZIP_DEFLATED  # bytes comprimidos copiados, sem recompressão
+        assert z.read(info) == PDF
+    # Nome não-ASCII gravado em UTF-8 com a flag; nomes ASCII sem ela
+    assert not z.infolist()[0].flag_bits & 0x800
+    assert all(i.flag_bits & 0x800 for i in z.infolist()[1:])
+
+def test_internos_ausentes_caem_na_copia_descomprimida(monkeypatch):
+    monkeypatch.setattr(entrada, "_INTERNOS_DESTINO", entrada._INTERNOS_DESTINO + ("_atributo_inexistente",))
+    z = _copiar(entradas_de("lote.zip", _zip_entrada()))
+    assert z.testzip() is None
+    assert [z.read(i) for i in z.infolist()] == [PDF] * 3
+    assert all(i.compress_type == zipfile.ZIP_STORED for i in z.infolist())
+
+def _zip_com_membro_corrompido():
+    """ZIP com um PDF íntegro e outro (sem compressão) com um byte trocado: CRC inválido."""
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as z:
+        z.writestr("Goiatuba.pdf", PDF)
+        z.writestr("Trindade.pdf", PDF.replace(b"conteudo", b"CONTEUDO", 1), compress_type=zipfile.ZIP_STORED)
+    return buf.getvalue().replace(b"CONTEUDO", b"conteudo", 1)
+
+def test_membro_corrompido_nao_derruba_o_lote(tmp_path, monkeypatch):
+    entradas = entradas_de("lote.zip", _zip_com_membro_corrompido())
+    resultados = list(extrair_arquivos(entradas, usar_cache=False))
+    assert resultados[1] == (("", "", ""), [], {}, "Erro ao ler PDF Trindade.pdf: Bad CRC-32 for file 'Trindade.pdf'")
+    assert resultados[0][3] != resultados[1][3]  # o íntegro segue para o parser
+
+    # Cópia do original pelo caminho descomprimido: o membro ilegível vira erro do lote
+    monkeypatch.setattr(entrada, "_INTERNOS_DESTINO", entrada._INTERNOS_DESTINO + ("_atributo_inexistente",))
+    resumo = processar_lote(entradas, ["Goiatuba", "Trindade"], str(tmp_path / "saida.zip"),
+                            usar_cache=False, usar_roteamento=False, formatos_dados=())
+    assert resumo["arquivos_usados"] == 2
+    assert resumo["erros"][1:] == ["Erro ao ler PDF Trindade.pdf: Bad CRC-32 for file 'Trindade.pdf'",
+                                   "Original de Trindade.pdf fora do ZIP: Bad CRC-32 for file 'Trindade.pdf'"]
+    with zipfile.ZipFile(tmp_path / "saida.zip") as z:
+        originais = [n for n in z.namelist() if n.startswith("Relatorios_Originais/")]
+    assert originais == ["Relatorios_Originais/Goiatuba.pdf"]
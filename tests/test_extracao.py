@@ -0,0 +1,96 @@
+"""Extração de relatórios longos em blocos de páginas: mesmo resultado do parse sequencial."""
+import random
+
+import fitz
+import pytest
+
+from conprev_restricoes import extracao
+from conprev_restricoes.extracao import (
+    _extract_pdf_completo, _blocos_paginas, _planejar_blocos, _extrair_bloco, _costurar_blocos,
+)
+from conprev_restricoes.paralelo import extrair_arquivos
+from conprev_restricoes.perfil import PerfilLote
+
+def _relatorio_irregular(paginas, seed):
+    """Relatório em que muitas páginas não repetem o cabeçalho CNPJ (o contexto vem de
+    páginas anteriores), com CNPJ sem nome, linhas soltas e registros de todos os tipos."""
+    rnd = random.Random(seed)
+    doc = fitz.open()
+    for p in range(paginas):
+        linhas = []
+        r = rnd.random()
+        if r < 0.2: linhas.append(f"CNPJ: {rnd.randrange(10**13, 10**14)} - ORGAO INLINE {p}")
+        elif r < 0.3: linhas += [f"CNPJ: 01.234.567/0001-{p % 100:02d}", "PREFEITURA SEM NUMERO"]
+        elif r < 0.35: linhas.append(f"CNPJ: 11.234.567/0001-{p % 100:02d}")  # muda só o CNPJ
+        linhas.append(f"Página {p + 1}")
+        for _ in range(rnd.randrange(3)):
+            linhas += ["1082-01 - CP SEGURADOS", "01/2023", "20/01/2023", "1,00", "2,00", "3,00", "4,00", "10,00", "DEVEDOR"]
+        if rnd.random() < 0.5: linhas += ["5440 - MAED DCTFWEB 1", "01/02/2023", "20/02/2023", "5,00", "6,00", "EM ABERTO"]
+        if rnd.random() < 0.2: linhas.append("DEVEDOR")  # registro incompleto (raw)
+        if rnd.random() < 0.3: linhas += ["OMISSÃO DE DECLARAÇÃO - GFIP", "PERÍODO", "03/2022"]
+        if rnd.random() < 0.3: linhas += ["PROCESSO FISCAL COM PENDÊNCIA", "10120.123.456/2023-01", "SITUAÇÃO: DEVEDOR"]
+        if rnd.random() < 0.2: linhas.append(f"CNPJ: 22.234.567/0001-{p % 100:02d} ente vinculado ao RPPS")
+        page = doc.new_page()
+        for k, linha in enumerate(linhas):
+            page.insert_text((40, 40 + 11 * k), linha, fontsize=9)
+    return doc.tobytes()
+
+def _pdf(paginas):
+    doc = fitz.open()
+    for linhas in paginas:
+        page = doc.new_page()
+        for k, linha in enumerate(linhas):
+            page.insert_text((40, 40 + 11 * k), linha, fontsize=9)
+    return doc.tobytes()
+
+def test_relatorio_curto_com_titulo_de_certidao_nao_e_cnd():
+    # Relatório de 2 páginas cujos registros só começam na segunda
+    pdf = _pdf([
+        ["MINISTÉRIO DA FAZENDA", "Informações de Apoio para Emissão de Certidão",
+         "CNPJ: 01.234.567/0001-89 - MUNICIPIO DE TESTE", "Data de Validade: 31/12/2026"],
+        ["1082-01 - CP SEGURADOS", "01/2023", "20/01/2023", "1,00", "2,00", "3,00", "4,00", "10,00", "DEVEDOR"],
+    ])
+    cnd, itens, _, erro = _extract_pdf_completo(pdf, "r.pdf", resolver_nomes=False)
+    assert erro is None
+    assert [(i["tipo"], i["cod"], i["cnpj"]) for i in itens] == [("DEVEDOR", "1082-01", "01.234.567/0001-89")]
+
+def test_cnd():
+    pdf = _pdf([["CERTIDÃO POSITIVA COM EFEITOS DE NEGATIVA", "Município: TESTE", "Data de Validade: 31/12/2026"]])
+    assert extracao._classificar_documento(extracao._PaginasPDF(pdf)[0], 1) == "CND"
+    assert _extract_pdf_completo(pdf, "c.pdf", resolver_nomes=False) == (("", "31/12/2026", "TESTE"), [], {}, None)
+
+@pytest.fixture
+def blocos_pequenos(monkeypatch):
+    monkeypatch.setattr(extracao, "_PAGINAS_POR_BLOCO", 3)
+    monkeypatch.setattr(extracao, "_BYTES_MIN_DIVISAO", 0)
+
+@pytest.mark.parametrize("paginas,seed", [(7, 0), (12, 1), (30, 2), (41, 3)])
+@pytest.mark.parametrize("partes", [2, 3, 5, 50])
+def test_costura_igual_ao_sequencial(blocos_pequenos, paginas, seed, partes):
+    pdf = _relatorio_irregular(paginas, seed)
+    sequencial = _extract_pdf_completo(pdf, "r.pdf", resolver_nomes=False)
+    blocos = [_extrair_bloco(pdf, "r.pdf", inicio, fim) for inicio, fim in _blocos_paginas(paginas, partes)]
+    assert _costurar_blocos(blocos[::-1], "r.pdf") == sequencial  # fora de ordem, como chegam do pool
+
+def test_blocos_contiguos(blocos_pequenos):
+    assert _blocos_paginas(10, 4) == [(0, 4), (4, 7), (7, 10)]
+    assert _blocos_paginas(2, 4) == [(0, 2)]
+
+def test_planejamento_classifica_a_primeira_pagina(blocos_pequenos, monkeypatch):
+    assert len(_planejar_blocos(_relatorio_irregular(12, 1), 4)) == 4
+    assert _planejar_blocos(_relatorio_irregular(5, 1), 4) == []   # curto demais
+    assert _planejar_blocos(_relatorio_irregular(12, 1), 1) == []  # sem paralelismo
+    assert _planejar_blocos(b"nao e um pdf", 4) == []
+    outro = fitz.open()
+    for _ in range(12): outro.new_page().insert_text((40, 40), "Ata de reunião", fontsize=9)
+    assert _planejar_blocos(outro.tobytes(), 4) == []                # não reconhecido: não divide
+    monkeypatch.setattr(extracao, "_BYTES_MIN_DIVISAO", 10**9)
+    assert _planejar_blocos(_relatorio_irregular(12, 1), 4) == []  # pequeno: nem abre
+
+def test_pool_igual_ao_sequencial(blocos_pequenos):
+    entradas = [(f"r{k}.pdf", _relatorio_irregular(n, k)) for k, n in enumerate([30, 41])]
+    sequencial = list(extrair_arquivos(entradas, workers=1, usar_cache=False))
+    perfil = PerfilLote()
+    assert list(extrair_arquivos(entradas, workers=3, usar_cache=False, perfil=perfil)) == sequencial
+    assert perfil.resumo()["etapas"]["costurar_blocos"]["n"] == 2  # os dois foram divididos
+    assert list(extrair_arquivos(entradas[1:], workers=3, usar_cache=False)) == sequencial[1:]
@@ -0,0 +1,34 @@
+"""Fila de lotes: expiração dos jobs antigos (fila.FilaLotes)."""
+import os
+import time
+
+from conprev_restricoes import fila
+from conprev_restricoes.fila import FilaLotes, CONCLUIDO
+from conprev_restricoes.perfil import PerfilLote
+
+def _processar_lote(arquivos, municipios, destino, **kw):
+    with open(destino, "wb") as f: f.write(b"zip")
+    return {"erros": [], "arquivos_usados": len(arquivos), "total_arquivos": len(arquivos),
+            "duplicatas": 0, "perfil": PerfilLote(), "execucao_historico": None}
+
+def _concluir(f, arquivos):
+    job_id = f.enviar(arquivos, ["Trindade"])
+    for _ in range(200):
+        if f.estado(job_id)["status"] == CONCLUIDO: return job_id
+        time.sleep(0.01)
+    raise AssertionError(f.estado(job_id))
+
+def test_job_expirado_sai_da_memoria(tmp_path, monkeypatch):
+    monkeypatch.setattr(fila, "processar_lote", _processar_lote)
+    f = FilaLotes(diretorio=str(tmp_path), retencao_s=3600)
+    arquivos = [("a.pdf", b"%PDF a")]
+    job_id = _concluir(f, arquivos)
+    assert f.enviar(arquivos, ["Trindade"]) == job_id  # mesmo lote: mesmo job
+
+    antigo = time.time() - 7200
+    os.utime(os.path.join(tmp_path, job_id, "estado.json"), (antigo, antigo))
+    f.limpar_antigos()
+    assert not os.path.exists(f.caminho_zip(job_id))
+    assert f.estado(job_id) is None  # "não encontrado", não um download quebrado
+    novo = _concluir(f, arquivos)
+    assert novo != job_id and os.path.exists(f.caminho_zip(novo))
@@ -0,0 +1,57 @@
+"""Novidades entre execuções gravadas no histórico (historico.HistoricoItens)."""
+import sqlite3
+from contextlib import closing
+
+from conprev_restricoes.armazem import ArmazemItens
+from conprev_restricoes.historico import HistoricoItens, NOVO, RESOLVIDO, ALTERADO
+
+A, B = "11.111.111/0001-11", "22.222.222/0001-22"
+DA, DB = "11111111000111", "22222222000122"
+
+def _armazem(*itens, municipio="Trindade"):
+    armazem = ArmazemItens([municipio])
+    armazem.estender([{"tipo": "DEVEDOR", "cod": cod, "nome": "CP SEGURADOS", "comp": "01/2024", "cons": v,
+                       "cons_centavos": round(v * 100), "cnpj": cnpj, "src": "r.pdf"}
+                      for cnpj, cod, v in itens], municipio)
+    return armazem
+
+def _resumo(mudancas):
+    return sorted((d["situacao"], d["cnpj"], d["cod"], d["valor_anterior"], d["valor_atual"]) for d in mudancas)
+
+def test_novo_resolvido_alterado(tmp_path):
+    h = HistoricoItens(str(tmp_path / "historico.sqlite3"))
+    e1 = h.registrar(_armazem((A, "1", 1.0), (A, "2", 2.0), (B, "3", 3.0)), ["Trindade"],
+                     cobertura={"Trindade": {DA, DB}})
+    assert h.novidades(e1) == ([], ["Trindade"])  # primeira execução: sem base
+
+    e2 = h.registrar(_armazem((A, "1", 5.0), (A, "4", 4.0)), ["Trindade"], cobertura={"Trindade": {DA}})
+    mudancas, sem_base = h.novidades(e2)
+    assert sem_base == []
+    # Sem o relatório de B nesta execução, os itens dele não são dados como resolvidos
+    assert _resumo(mudancas) == [(ALTERADO, DA, "1", 100, 500), (NOVO, DA, "4", None, 400),
+                                 (RESOLVIDO, DA, "2", 200, None)]
+
+    # B volta sem itens: compara com a última execução que teve documento dele (e1)
+    e3 = h.registrar(_armazem((A, "1", 5.0), (A, "4", 4.0)), ["Trindade"], cobertura={"Trindade": {DA, DB}})
+    assert _resumo(h.novidades(e3)[0]) == [(RESOLVIDO, DB, "3", 300, None)]
+
+def test_municipio_fora_do_lote_nao_e_comparado(tmp_path):
+    h = HistoricoItens(str(tmp_path / "historico.sqlite3"))
+    h.registrar(_armazem((A, "1", 1.0)), ["Trindade"])
+    e2 = h.registrar(_armazem((A, "1", 1.0), municipio="Goiatuba"), ["Goiatuba"])
+    assert h.novidades(e2) == ([], ["Goiatuba"])
+    assert h.municipios(e2) == {"Goiatuba"}
+
+def test_migracao_de_banco_sem_cobertura(tmp_path):
+    caminho = str(tmp_path / "historico.sqlite3")
+    h = HistoricoItens(caminho)
+    e1 = h.registrar(_armazem((A, "1", 1.0), (B, "3", 3.0)), ["Trindade"])
+    # Banco de antes da cobertura por CNPJ: sem execucao_cnpjs e com user_version 0
+    with closing(sqlite3.connect(caminho)) as conn, conn:
+        conn.execute("DELETE FROM execucao_cnpjs")
+        conn.execute("PRAGMA user_version = 0")
+    e2 = h.registrar(_armazem((A, "1", 2.0)), ["Trindade"], cobertura={"Trindade": {DA, DB}})
+    assert _resumo(h.novidades(e2)[0]) == [(ALTERADO, DA, "1", 100, 200), (RESOLVIDO, DB, "3", 300, None)]
+    with closing(sqlite3.connect(caminho)) as conn:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == 1
+        assert conn.execute("SELECT cnpj FROM execucao_cnpjs WHERE execucao = ? ORDER BY 1", (e1,)).fetchall() == [(DA,), (DB,)]